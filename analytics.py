@@ -0,0 +1,122 @@
+"""
+Hall utilization analytics
+
+At refresh time a schedule is turned into a dense occupancy matrix,
+halls x days x time slots with one bool per cell, and every statistic
+served under /api/analytics is computed from it with NumPy reductions,
+once per snapshot. Requests only read the results.
+
+A slot counts as busy if any class overlaps it. Utilization is the share
+of busy slots within the opening hours.
+
+NumPy is listed in requirements.txt; an install without it still runs, with
+analytics disabled.
+"""
+
+from hall_index import minutes_to_time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ANALYTICS_AVAILABLE = np is not None
+
+
+def occupancy_matrix(schedule, days, opens, closes, slot_minutes):
+    """bool array [hall, day, slot] of `schedule`, slots of `slot_minutes` from `opens` to `closes`"""
+    slots = -(-(closes - opens) // slot_minutes)
+    hall_positions = {hall: i for i, hall in enumerate(schedule.halls)}
+    day_positions = {day: i for i, day in enumerate(days)}
+    halls, day_indexes, starts, ends = [], [], [], []
+    for day, day_halls in schedule.days.items():
+        if day not in day_positions:
+            continue
+        for hall, classes in day_halls.items():
+            # Only halls of schedule.halls have a row (Schedule.add registers them)
+            position = hall_positions.get(hall)
+            if position is None:
+                continue
+            for cls in classes:
+                halls.append(position)
+                day_indexes.append(day_positions[day])
+                starts.append(cls.start)
+                ends.append(cls.end)
+    halls = np.array(halls, dtype=np.int64)
+    day_indexes = np.array(day_indexes, dtype=np.int64)
+    # First and one-past-last slot each class overlaps, clipped to the opening hours
+    first = np.clip((np.array(starts, dtype=np.int64) - opens) // slot_minutes, 0, slots)
+    last = np.clip(-(-(np.array(ends, dtype=np.int64) - opens) // slot_minutes), 0, slots)
+    keep = last > first
+    # +1 where a class starts, -1 where it ends, then a running sum along the slots
+    changes = np.zeros((len(schedule.halls), len(days), slots + 1), dtype=np.int32)
+    np.add.at(changes, (halls[keep], day_indexes[keep], first[keep]), 1)
+    np.add.at(changes, (halls[keep], day_indexes[keep], last[keep]), -1)
+    return np.cumsum(changes, axis=2)[:, :, :slots] > 0
+
+
+class Analytics:
+    """Utilization statistics of one schedule; `views` holds the JSON payload of each endpoint"""
+
+    def __init__(self, schedule, days, opens=8 * 60, closes=20 * 60, slot_minutes=30, top=10):
+        occupied = occupancy_matrix(schedule, days, opens, closes, slot_minutes)
+        halls = schedule.halls
+        hall_count, _, slot_count = occupied.shape
+        slot_starts = [opens + slot * slot_minutes for slot in range(slot_count)]
+        self.settings = {
+            'opens': minutes_to_time(opens),
+            'closes': minutes_to_time(closes),
+            'slot_minutes': slot_minutes,
+            'slots': [minutes_to_time(start) for start in slot_starts],
+        }
+
+        by_hall_day = occupied.mean(axis=2) if slot_count else np.zeros(occupied.shape[:2])
+        by_hall = by_hall_day.mean(axis=1) if days else np.zeros(hall_count)
+        order = np.argsort(by_hall, kind='stable')
+        # Least used first: the question is usually which halls are underused
+        self.halls = [{
+            'hall': halls[i],
+            'utilization': round(float(by_hall[i]), 4),
+            'busy_hours': round(float(occupied[i].sum()) * slot_minutes / 60, 2),
+            'by_day': {day: round(float(by_hall_day[i, d]), 4) for d, day in enumerate(days)},
+        } for i in order.tolist()]
+
+        busy = occupied.sum(axis=0)                    # [day, slot] halls in use
+        free = hall_count - busy
+        self.days = {day: {
+            'utilization': round(float(busy[d].sum()) / (hall_count * slot_count), 4) if hall_count and slot_count else 0.0,
+            'busy_halls_peak': int(busy[d].max()) if slot_count else 0,
+            'free_halls_min': int(free[d].min()) if slot_count else hall_count,
+        } for d, day in enumerate(days)}
+        self.free_halls = {
+            'halls': hall_count,
+            'slots': self.settings['slots'],
+            'free': {day: free[d].tolist() for d, day in enumerate(days)},
+        }
+
+        # Busiest and quietest (day, slot) pairs; ties keep day and time order
+        flat = busy.ravel()
+        ranked = np.argsort(-flat, kind='stable')
+        quiet = np.argsort(flat, kind='stable')
+
+        def slot_records(positions):
+            records = []
+            for position in positions[:top].tolist():
+                d, slot = divmod(position, slot_count)
+                records.append({
+                    'day': days[d],
+                    'start': minutes_to_time(slot_starts[slot]),
+                    'end': minutes_to_time(min(slot_starts[slot] + slot_minutes, closes)),
+                    'busy_halls': int(busy[d, slot]),
+                    'free_halls': int(free[d, slot]),
+                })
+            return records
+        self.slots = {'peak': slot_records(ranked), 'quiet': slot_records(quiet)}
+
+        header = {key: value for key, value in self.settings.items() if key != 'slots'}
+        self.views = {
+            'halls': dict(header, halls=self.halls),
+            'days': dict(header, days=self.days),
+            'slots': dict(header, **self.slots),
+            'free-halls': dict(header, **self.free_halls),
+        }
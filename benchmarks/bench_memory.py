@@ -0,0 +1,83 @@
+"""
+Benchmark: per-worker memory of the schedule, dicts vs the compact model
+
+    python benchmarks/bench_memory.py [--cache schedule_cache.json] [--scale 1 10 100]
+
+For each scale the cache is coalesced and blown up to `scale` copies of
+the faculty (every hall, subject, professor and group renamed per copy, so
+interning can't cheat), then written as the JSON export and as a snapshot.
+A fresh interpreter per measurement loads one of them and reports how much
+its resident set grew:
+
+    dicts    json.load of the export, the `schedule[day][hall] -> [dict]`
+             shape the workers used to keep
+    model    read_snapshot into schedule_model records, what they keep now
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot import read_snapshot, write_snapshot  # noqa: E402
+from synthetic import CACHE_FIXTURE, load_fixture, scaled  # noqa: E402
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(kind, path):
+    """Runs in the child: RSS growth from loading `path` the `kind` way"""
+    gc.collect()
+    before = rss_bytes()
+    if kind == 'dicts':
+        with open(path, 'r', encoding='utf-8') as f:
+            kept = json.load(f)
+    else:
+        kept = read_snapshot(path)
+    gc.collect()
+    print(rss_bytes() - before)
+    return kept
+
+
+def child(kind, path):
+    output = subprocess.run([sys.executable, __file__, '--child', kind, path],
+                            check=True, capture_output=True, text=True).stdout
+    return int(output.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cache', default=CACHE_FIXTURE)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--child', nargs=2, metavar=('KIND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        measure(*args.child)
+        return
+
+    base = load_fixture(args.cache)
+
+    print(f"{'scale':>6}{'entries':>10}{'dicts MB':>11}{'model MB':>11}{'saved':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            schedule = scaled(base, scale)
+            json_path = os.path.join(tmp, f'schedule_{scale}.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'schedule': schedule.to_json(), 'halls': schedule.halls}, f, ensure_ascii=False)
+            snapshot_path = os.path.join(tmp, f'schedule_{scale}.bin')
+            write_snapshot(snapshot_path, schedule)
+            dicts, model = child('dicts', json_path), child('model', snapshot_path)
+            print(f"{scale:>6}{schedule.entry_count():>10}{dicts / 2**20:>11.2f}{model / 2**20:>11.2f}"
+                  f"{1 - model / dicts if dicts else 0:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: timetable page parsing throughput per parser backend
+
+    python benchmarks/bench_parse.py [--seconds S] [PAGE ...]
+
+Parses each page (schedule_test.html by default) with every backend,
+fails if any backend disagrees with the BeautifulSoup reference, and
+reports pages parsed per second.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timetable_parser import BACKENDS, parse_timetable  # noqa: E402
+
+
+def pages_per_second(content, backend, seconds):
+    parsed = 0
+    started = time.perf_counter()
+    while True:
+        parse_timetable(content, '1', 'A1', backend=backend)
+        parsed += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return parsed / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pages', nargs='*', default=['schedule_test.html'])
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per backend and page')
+    args = parser.parse_args()
+
+    print(f"{'page':<24}{'backend':<10}{'classes':>9}{'pages/s':>10}")
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            content = f.read()
+        reference = parse_timetable(content, '1', 'A1', backend='bs4')
+        for backend in BACKENDS:
+            result = parse_timetable(content, '1', 'A1', backend=backend)
+            if result != reference:
+                sys.exit(f"{backend} parser output differs from the reference on {path}!")
+            rate = pages_per_second(content, backend, args.seconds)
+            print(f"{os.path.basename(path):<24}{backend:<10}{len(result or []):>9}{rate:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark: a full scrape_all against the replay stand-in server
+
+    python benchmarks/bench_refresh.py RECORDING [--concurrency 1 4 8 16] [--latency 80]
+                                       [--jitter 40] [--error-rate 0] [--server-concurrency 0]
+
+RECORDING is a directory written by `python replay.py record`. Each run
+starts a fresh stand-in (replay.create_app) in this process and crawls it
+end to end with a new ScheduleScraper, then reports wall time, request
+and page counts and how many requests the server saw at once.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SCRAPE_LOG_OUTPUT', '0')
+
+from empty_halls_scraper import ScheduleScraper  # noqa: E402
+from replay import create_app, start_server  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--per-host', type=int, default=None, help='per-host cap (default: the concurrency)')
+    parser.add_argument('--latency', type=float, default=80, help='milliseconds per request')
+    parser.add_argument('--jitter', type=float, default=40, help='± milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--server-concurrency', type=int, default=0, help='stand-in limit (0 = unlimited)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>12}{'wall s':>9}{'requests':>10}{'pages':>7}{'failed':>8}{'pages/s':>9}{'server max':>12}")
+    for concurrency in args.concurrency:
+        app = create_app(args.recording, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                         error_rate=args.error_rate, concurrency=args.server_concurrency, seed=args.seed)
+        server, base_url = start_server(app)
+        try:
+            scraper = ScheduleScraper(base_url, concurrency=concurrency, per_host=args.per_host or concurrency)
+            scraper.scrape_all()
+        finally:
+            server.shutdown()
+        stats, served = scraper.stats, app.config['REPLAY_STATS']
+        wall = stats['wall_time'] or 0
+        print(f"{concurrency:>12}{wall:>9.2f}{stats['requests']:>10}{stats['pages']:>7}{stats['failed_pages']:>8}"
+              f"{stats['pages'] / wall if wall else 0:>9.1f}{served['max_active']:>12}")
+
+
+if __name__ == '__main__':
+    main()
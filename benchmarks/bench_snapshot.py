@@ -0,0 +1,98 @@
+"""
+Benchmark: JSON cache load vs binary snapshot load
+
+    python benchmarks/bench_snapshot.py [--repeat N] [--cache schedule_cache.json]
+
+Coalesces the JSON cache like a refresh does, writes it back out both as
+JSON (save_cache's format) and as a snapshot, checks both decode to the
+same schedule, then reports file size, load time and peak memory while
+loading (tracemalloc) for each path, plus the cost of decoding a single
+day lazily. Peak, not retained, memory: both paths end in the same
+schedule_model.Schedule, but JSON first builds the whole dict tree.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import coalesce_schedule  # noqa: E402
+from schedule_model import Schedule  # noqa: E402
+from snapshot import SnapshotReader, read_snapshot, write_snapshot  # noqa: E402
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return Schedule.from_json(data.get('schedule', {}), data.get('halls', []))
+
+
+def time_it(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def peak_bytes(func):
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def lazy_one_day(path):
+    reader = SnapshotReader(path)
+    try:
+        return reader.day(reader.days[0])
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cache', default='schedule_cache.json')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    schedule, _ = coalesce_schedule(load_json(args.cache))
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'schedule_cache.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'schedule': schedule.to_json(), 'halls': schedule.halls}, f, ensure_ascii=False, indent=2)
+        snapshot_path = os.path.join(tmp, 'schedule_cache.bin')
+        write_snapshot(snapshot_path, schedule)
+        if read_snapshot(snapshot_path)[0] != load_json(json_path):
+            sys.exit("Snapshot round trip does not match the JSON cache!")
+
+        rows = [
+            ('json', os.path.getsize(json_path),
+             time_it(lambda: load_json(json_path), args.repeat),
+             peak_bytes(lambda: load_json(json_path))),
+            ('snapshot', os.path.getsize(snapshot_path),
+             time_it(lambda: read_snapshot(snapshot_path), args.repeat),
+             peak_bytes(lambda: read_snapshot(snapshot_path))),
+            ('snapshot (1 day)', os.path.getsize(snapshot_path),
+             time_it(lambda: lazy_one_day(snapshot_path), args.repeat),
+             peak_bytes(lambda: lazy_one_day(snapshot_path))),
+        ]
+
+    print(f"{'loader':<18}{'file KB':>10}{'load ms':>10}{'peak KB':>12}")
+    for name, size, seconds, memory in rows:
+        print(f"{name:<18}{size / 1024:>10.1f}{seconds * 1000:>10.2f}{memory / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
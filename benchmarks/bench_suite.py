@@ -0,0 +1,234 @@
+"""
+Benchmark suite: parsing, ingest, index build, snapshots, queries and the API
+
+    python benchmarks/bench_suite.py [--scale 1 10 100] [--repeat 5] [--output results.json]
+                                     [--compare baseline.json [--threshold 0.1]]
+
+Driven by the checked-in schedule_cache.json and schedule_test.html, plus
+synthetic faculties with `scale` times the halls and groups (see
+synthetic.py). Cases needing an optional package (numpy) are skipped
+without it. Every case is timed `repeat` times and the median kept.
+Results are written as JSON (stdout or --output) with a human readable
+table on stderr; --compare prints the change against an earlier results
+file and exits 1 if any case got worse by more than --threshold.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SCRAPE_LOG_OUTPUT', '0')
+
+from analytics import ANALYTICS_AVAILABLE, Analytics  # noqa: E402
+from hall_index import HallIndex  # noqa: E402
+from ingest import coalesce_schedule  # noqa: E402
+from schedule_db import ScheduleDB  # noqa: E402
+from schedule_model import Schedule  # noqa: E402
+from snapshot import encode_snapshot, read_snapshot, write_snapshot  # noqa: E402
+from synthetic import CACHE_FIXTURE, PAGE_FIXTURES, ROOT, load_fixture, scaled  # noqa: E402
+from timetable_parser import BACKENDS, DAYS, parse_timetable  # noqa: E402
+
+# Units where a bigger value is better; for the rest (times, sizes) smaller is better
+HIGHER_IS_BETTER = {'req/s', 'pages/s'}
+
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def timed(self, func, number=1):
+        """Median seconds per call of `func` over `repeat` batches of `number` calls"""
+        timings = []
+        for _ in range(self.repeat):
+            gc.collect()
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - started) / number)
+        return statistics.median(timings)
+
+    def add(self, name, scale, value, unit):
+        self.results.append({'name': name, 'scale': scale, 'value': round(value, 3), 'unit': unit})
+        print(f"{name:<28}{scale:>6}x{value:>14.3f} {unit}", file=sys.stderr)
+
+
+def bench_parse(suite):
+    for path in PAGE_FIXTURES:
+        with open(path, 'rb') as f:
+            content = f.read()
+        for backend in BACKENDS:
+            seconds = suite.timed(lambda: parse_timetable(content, '1', 'A1', backend=backend), number=5)
+            suite.add(f"parse.{backend}", 1, 1 / seconds, 'pages/s')
+
+
+def bench_ingest(suite):
+    with open(CACHE_FIXTURE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    raw = Schedule.from_json(data.get('schedule', {}), data.get('halls', []))
+    suite.add('ingest.coalesce', 1, suite.timed(lambda: coalesce_schedule(raw)) * 1000, 'ms')
+
+
+def query_args(schedule, count=200):
+    rng = random.Random(1)
+    days = list(schedule.days) or DAYS
+    return [(rng.choice(days), rng.randrange(8 * 60, 20 * 60)) for _ in range(count)]
+
+
+def bench_schedule(suite, schedule, scale, tmp):
+    suite.add('index.build', scale, suite.timed(lambda: HallIndex(schedule)) * 1000, 'ms')
+    if ANALYTICS_AVAILABLE:
+        suite.add('analytics.build', scale, suite.timed(lambda: Analytics(schedule, DAYS)) * 1000, 'ms')
+
+    # Snapshot and JSON export
+    data = encode_snapshot(schedule)
+    suite.add('snapshot.bytes', scale, len(data), 'bytes')
+    suite.add('snapshot.encode', scale, suite.timed(lambda: encode_snapshot(schedule)) * 1000, 'ms')
+    snapshot_path = os.path.join(tmp, f'schedule_{scale}.bin')
+    write_snapshot(snapshot_path, schedule)
+    suite.add('snapshot.load', scale, suite.timed(lambda: read_snapshot(snapshot_path)) * 1000, 'ms')
+    json_path = os.path.join(tmp, f'schedule_{scale}.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'schedule': schedule.to_json(), 'halls': schedule.halls}, f, ensure_ascii=False)
+
+    def load_json():
+        with open(json_path, 'r', encoding='utf-8') as f:
+            exported = json.load(f)
+        return Schedule.from_json(exported['schedule'], exported['halls'])
+    suite.add('json.load', scale, suite.timed(load_json) * 1000, 'ms')
+
+    # Free-hall queries, in-memory index and SQLite
+    index = HallIndex(schedule)
+    queries = query_args(schedule)
+    per_query = len(queries)
+
+    def run(func):
+        for day, minute in queries:
+            func(day, minute)
+    suite.add('query.free_halls', scale, suite.timed(lambda: run(index.free_halls)) / per_query * 1e6, 'us')
+    suite.add('query.free_between', scale,
+              suite.timed(lambda: run(lambda day, minute: index.free_between(day, minute, minute + 90)))
+              / per_query * 1e6, 'us')
+    hall = schedule.halls[len(schedule.halls) // 2] if schedule.halls else ''
+    suite.add('query.hall_status', scale,
+              suite.timed(lambda: run(lambda day, minute: index.hall_status(day, hall, minute)))
+              / per_query * 1e6, 'us')
+    db = ScheduleDB(os.path.join(tmp, f'schedule_{scale}.db'))
+    db.write(schedule, 1)
+    sqlite_index = db.index(1)
+    suite.add('query.sqlite_free_halls', scale,
+              suite.timed(lambda: run(sqlite_index.free_halls)) / per_query * 1e6, 'us')
+
+
+def bench_api(suite, app_module, schedule, scale):
+    client = app_module.create_app(scheduler=False).test_client()
+    app_module.default_faculty.publish(schedule, scale)
+    gzip_headers = {'Accept-Encoding': 'gzip'}
+    etag = client.get('/api/schedule', headers=gzip_headers).headers['ETag']
+    number = 50
+
+    def full():
+        client.get('/api/schedule', headers=gzip_headers)
+
+    def revalidate():
+        client.get('/api/schedule', headers=dict(gzip_headers, **{'If-None-Match': etag}))
+    day, minute = query_args(schedule, 1)[0]
+    free_url = f"/api/free-halls?day={day}&time={minute // 60:02d}:{minute % 60:02d}"
+
+    def free_halls():
+        client.get(free_url)
+    suite.add('api.schedule_gzip', scale, 1 / suite.timed(full, number), 'req/s')
+    suite.add('api.schedule_304', scale, 1 / suite.timed(revalidate, number), 'req/s')
+    suite.add('api.free_halls', scale, 1 / suite.timed(free_halls, number), 'req/s')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change of every case against a baseline; True if any regressed"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['name'], r['scale']): r for r in json.load(f)['results']}
+    regressed = False
+    print(f"\n{'case':<28}{'scale':>7}{'baseline':>14}{'now':>14}{'change':>9}", file=sys.stderr)
+    for result in results:
+        old = baseline.get((result['name'], result['scale']))
+        if not old or not old['value']:
+            continue
+        change = result['value'] / old['value'] - 1
+        worse = -change if result['unit'] in HIGHER_IS_BETTER else change
+        flag = '  REGRESSION' if worse > threshold else ''
+        regressed = regressed or bool(flag)
+        print(f"{result['name']:<28}{result['scale']:>6}x{old['value']:>14.3f}{result['value']:>14.3f}"
+              f"{change:>+9.0%}{flag}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='tolerated slowdown for --compare')
+    args = parser.parse_args()
+
+    suite = Suite(args.repeat)
+    started = time.time()
+    bench_parse(suite)
+    bench_ingest(suite)
+    base = load_fixture()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app keeps its cache files in the working directory; keep them out of the checkout
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            # The app prints its progress; stdout is reserved for the JSON results
+            with contextlib.redirect_stdout(sys.stderr):
+                import empty_halls_scraper as app_module
+                for scale in args.scale:
+                    schedule = scaled(base, scale)
+                    bench_schedule(suite, schedule, scale, tmp)
+                    bench_api(suite, app_module, schedule, scale)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started': round(started, 3),
+            'seconds': round(time.time() - started, 1),
+            'repeat': args.repeat,
+            'scales': args.scale,
+        },
+        'results': suite.results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare and compare(suite.results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Fixtures for the benchmarks: the checked-in schedule cache, and synthetic
+faculties made by scaling it up
+"""
+
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingest import coalesce_schedule  # noqa: E402
+from schedule_model import Schedule  # noqa: E402
+
+CACHE_FIXTURE = os.path.join(ROOT, 'schedule_cache.json')
+PAGE_FIXTURES = [os.path.join(ROOT, 'schedule_test.html')]
+
+
+def load_fixture(path=CACHE_FIXTURE):
+    """The JSON cache as a coalesced Schedule, like a refresh would publish it"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    schedule, _ = coalesce_schedule(Schedule.from_json(data.get('schedule', {}), data.get('halls', [])))
+    return schedule
+
+
+def scaled(schedule, scale):
+    """`scale` copies of the faculty in one Schedule.
+
+    Every hall, subject, professor and group is renamed per copy, so the
+    result has `scale` times the halls and groups and interning can't
+    collapse the copies.
+    """
+    result = Schedule()
+    for copy in range(scale):
+        suffix = f" #{copy}" if copy else ''
+        for hall in schedule.halls:
+            result.add_hall(hall + suffix)
+        for day, day_halls in schedule.days.items():
+            for hall, classes in day_halls.items():
+                for cls in classes:
+                    result.add(day, hall + suffix, cls.start, cls.end, cls.subject + suffix,
+                               cls.professor + suffix, [group + suffix for group in cls.groups])
+    return result
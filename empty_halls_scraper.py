@@ -1,68 +1,516 @@
 """
 Empty Halls Finder for FSHN - Debug Version
+
+Run `python empty_halls_scraper.py`, or serve it with gunicorn as
+`gunicorn -w 4 'empty_halls_scraper:create_app()'`. Importing the module
+starts nothing, so tools can use ScheduleScraper without the app.
 """
 
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, g, jsonify, request
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import atexit
+import hashlib
 import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from analytics import ANALYTICS_AVAILABLE, Analytics
+from hall_index import HallIndex, time_to_minutes
+from ingest import coalesce_schedule
+from metrics import BYTE_BUCKETS, CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram
+from precompressed import PrecompressedBody, serve
+from replay import Recorder
+from schedule_db import ScheduleDB
+from schedule_model import Schedule, schedule_delta
+from snapshot import read_snapshot, read_snapshot_version, write_snapshot
+from timetable_parser import DAYS, parse_page
+from worker_sync import FileLock, file_signature, read_state, read_worker_states, write_state, write_worker_state
 
 app = Flask(__name__)
 
-# IMPORTANT: Update this with your actual URL
-BASE_URL = "http://37.139.119.36:81/orari/student"
+# IMPORTANT: Update this with your actual URL (or point BASE_URL at a replay.py stand-in)
+BASE_URL = os.environ.get('BASE_URL', "http://37.139.119.36:81/orari/student")
+# Timetable sources served by this deployment, as comma separated 'key=url' pairs
+# (e.g. 'fshn=http://host/orari/student,fe=http://other/orari/student'); empty = BASE_URL alone,
+# as DEFAULT_FACULTY. The first source is the default one behind the unscoped /api routes and the
+# page; every source also answers under /api/<key>/...
+FACULTIES = os.environ.get('FACULTIES', '')
+DEFAULT_FACULTY = os.environ.get('DEFAULT_FACULTY', 'fshn')
+
+# Crawl tuning: total parallel requests, and how many of them may hit one host at once
+SCRAPE_CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', '8'))
+SCRAPE_PER_HOST = int(os.environ.get('SCRAPE_PER_HOST', '4'))
+# Requests in flight to the timetable servers across all concurrent crawls (0 = no global cap);
+# the per-host cap is shared by the crawls as well
+SCRAPE_GLOBAL_CONCURRENCY = int(os.environ.get('SCRAPE_GLOBAL_CONCURRENCY', str(SCRAPE_CONCURRENCY)))
+REQUEST_TIMEOUT = 10
+# Resilience: failed requests (errors, 429/5xx) are retried SCRAPE_RETRIES times with jittered
+# exponential backoff from SCRAPE_BACKOFF seconds; a refresh gives up after REFRESH_DEADLINE
+# seconds (0 = never) or once SCRAPE_BREAKER_THRESHOLD requests in a row have failed
+SCRAPE_RETRIES = int(os.environ.get('SCRAPE_RETRIES', '2'))
+SCRAPE_BACKOFF = float(os.environ.get('SCRAPE_BACKOFF', '0.5'))
+SCRAPE_BACKOFF_MAX = 8.0
+REFRESH_DEADLINE = float(os.environ.get('REFRESH_DEADLINE', '600'))
+SCRAPE_BREAKER_THRESHOLD = int(os.environ.get('SCRAPE_BREAKER_THRESHOLD', '10'))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Completeness check: a crawl doesn't replace the served schedule if more than this share of
+# its pages failed, or if it has fewer than this share of the served classes or halls
+SCRAPE_MAX_FAILED_RATIO = float(os.environ.get('SCRAPE_MAX_FAILED_RATIO', '0.1'))
+SNAPSHOT_MIN_RATIO = float(os.environ.get('SNAPSHOT_MIN_RATIO', '0.7'))
+# Hierarchy cache: the department/year/group tree is reused for HIERARCHY_TTL seconds (0 = rediscover
+# every refresh); meanwhile each refresh revalidates this share of its departments in the background
+HIERARCHY_TTL = float(os.environ.get('HIERARCHY_TTL', str(7 * 24 * 3600)))
+HIERARCHY_SAMPLE = float(os.environ.get('HIERARCHY_SAMPLE', '0.25'))
+# Page pipeline: timetable pages are parsed in PARSE_WORKERS processes (0 = in the fetching
+# threads), started by the first running crawl of a process and shared by its crawls, and merged
+# by one thread per crawl; at most PIPELINE_DEPTH fetched pages wait to be merged
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', str(min(4, (os.cpu_count() or 1) - 1))))
+PIPELINE_DEPTH = int(os.environ.get('PIPELINE_DEPTH', '32'))
+# Timetable parser backend: 'stream' (fast tokenizer) or 'bs4' (original tree walk)
+PARSER_BACKEND = os.environ.get('PARSER_BACKEND', 'stream')
+
+# Scrape logging: minimum level kept, how many records the in-memory ring buffer holds,
+# and whether records are also written to stderr (from a background thread)
+SCRAPE_LOG_LEVEL = logging.getLevelName(os.environ.get('SCRAPE_LOG_LEVEL', 'INFO').upper())
+SCRAPE_LOG_BUFFER = int(os.environ.get('SCRAPE_LOG_BUFFER', '500'))
+SCRAPE_LOG_OUTPUT = os.environ.get('SCRAPE_LOG_OUTPUT', '1') == '1'
+# Directory to record every upstream response of a refresh into, for offline replay (see replay.py)
+SCRAPE_RECORD_DIR = os.environ.get('SCRAPE_RECORD_DIR', '')
+
+
+_parse_pool = None
+_parse_pool_users = 0
+_parse_pool_lock = threading.Lock()
+
+
+def acquire_parse_pool():
+    """The parser processes for a starting crawl, shared with the other running crawls of this
+    process; None if PARSE_WORKERS is 0 or they can't be started. Pair with release_parse_pool().
+
+    Started from a forkserver (spawn where there is none) rather than by
+    forking this multi-threaded process. Workers only run
+    timetable_parser.parse_page, and importing this module starts nothing
+    (see create_app), so they never run the app's startup.
+    """
+    global _parse_pool, _parse_pool_users
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                # Imported once by the server, not by every worker
+                context.set_forkserver_preload(['__main__', 'timetable_parser'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            try:
+                _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+            except (OSError, ValueError) as e:
+                print(f'Could not start parser processes ({e}), parsing in the fetch threads.')
+                return None
+        _parse_pool_users += 1
+        return _parse_pool
+
+
+def release_parse_pool():
+    """A crawl is done with the parser processes; the last one out stops them"""
+    global _parse_pool, _parse_pool_users
+    with _parse_pool_lock:
+        _parse_pool_users -= 1
+        if _parse_pool_users > 0:
+            return
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+scrape_logger = logging.getLogger('empty_halls.scraper')
+scrape_logger.setLevel(SCRAPE_LOG_LEVEL)
+scrape_logger.propagate = False
+# Silent until start_scrape_log(); without any handler logging.lastResort would still print
+# warnings and errors to stderr
+scrape_logger.addHandler(logging.NullHandler())
+_log_listener = None
+
+
+def start_scrape_log():
+    """Write scrape records to stderr from a background thread, if SCRAPE_LOG_OUTPUT (once per process)"""
+    global _log_listener
+    if not SCRAPE_LOG_OUTPUT or _log_listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    scrape_logger.addHandler(QueueHandler(log_queue))
+    _log_listener = QueueListener(log_queue, logging.StreamHandler())
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+# Prometheus metrics, served at /metrics
+UPSTREAM_SECONDS = Histogram('empty_halls_upstream_request_seconds',
+                             'Latency of requests to the timetable server', ['endpoint'])
+UPSTREAM_REQUESTS = Counter('empty_halls_upstream_requests_total',
+                            'Requests to the timetable server by response status', ['endpoint', 'status'])
+UPSTREAM_RETRIES = Counter('empty_halls_upstream_retries_total', 'Retried requests to the timetable server',
+                           ['endpoint'])
+PARSE_SECONDS = Histogram('empty_halls_parse_seconds', 'Time to parse one timetable page')
+PAGES = Counter('empty_halls_pages_total', 'Timetable pages crawled, by outcome', ['status'])
+REFRESH_SECONDS = Histogram('empty_halls_refresh_seconds', 'Duration of a whole refresh', ['faculty', 'status'])
+REFRESH_PHASE_SECONDS = Histogram('empty_halls_refresh_phase_seconds',
+                                  'Time a refresh spends in each crawl phase', ['phase'])
+SNAPSHOT_BYTES = Gauge('empty_halls_snapshot_bytes', 'Size of the published schedule, by encoding',
+                       ['faculty', 'encoding'])
+SNAPSHOT_CLASSES = Gauge('empty_halls_snapshot_classes', 'Classes in the published schedule', ['faculty'])
+SNAPSHOT_VERSION = Gauge('empty_halls_snapshot_version', 'Version of the published schedule', ['faculty'])
+SNAPSHOT_MEMORY = Gauge('empty_halls_snapshot_memory_bytes',
+                        'Approximate memory of the published schedule, its index and encoded bodies', ['faculty'])
+HTTP_SECONDS = Histogram('empty_halls_http_request_seconds', 'Latency of requests to this app', ['endpoint'])
+HTTP_RESPONSE_BYTES = Histogram('empty_halls_http_response_bytes', 'Body size of responses of this app',
+                                ['endpoint'], buckets=BYTE_BUCKETS)
+
+def hierarchy_pages(hierarchy):
+    """(department, year, group) of every timetable page in a hierarchy tree"""
+    return [(branch['value'], year, group) for branch in hierarchy['departments']
+            for year, groups in branch['years'].items() for group in groups]
+
+
+class RefreshAborted(Exception):
+    """The crawl gave up: deadline exceeded or circuit breaker open"""
+
+
+class UpstreamBudget:
+    """Caps on requests in flight to the timetable servers: `total` over all hosts (0 = none)
+    and `per_host` to any one host. Crawls sharing a budget share its caps."""
+
+    def __init__(self, total, per_host):
+        self.total = threading.BoundedSemaphore(total) if total else None
+        self.per_host = per_host
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        """`with budget.slot(url):` holds one request to the host of `url`"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            host_slot = self._hosts.get(host)
+            if host_slot is None:
+                host_slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+        with host_slot:
+            if self.total is None:
+                yield
+            else:
+                with self.total:
+                    yield
+
 
 class ScheduleScraper:
-    def scrape_all(self):
-        """Scrape all departments, years, and groups and aggregate hall usage"""
-        self.log("\n=== Scraping all schedules for faculty ===")
+    def scrape_all(self, concurrency=None):
+        """Scrape all departments, years, and groups and aggregate hall usage.
+
+        Requests are issued from a thread pool of `concurrency` workers
+        (SCRAPE_CONCURRENCY by default, 1 = the old serial crawl) sharing one
+        keep-alive session; results are merged under a lock.
+
+        Given a cached hierarchy the department/year/group discovery is
+        skipped and timetable pages are requested straight away, while a
+        background thread revalidates the department list and a sample of
+        the branches; groups the cache didn't know are scraped at the end.
+        self.hierarchy is the tree to cache for the next crawl.
+        """
+        concurrency = max(1, concurrency or self.concurrency)
+        started = time.perf_counter()
+        if self.deadline_seconds:
+            self.deadline = time.monotonic() + self.deadline_seconds
+        self.log(f"=== Scraping all schedules for faculty (concurrency {concurrency}) ===")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix='revalidate') as background:
+            revalidation = None
+            if self.cached_hierarchy is not None:
+                self.stats['hierarchy'] = 'cached'
+                self.log(f"Using the cached hierarchy from {datetime.fromtimestamp(self.cached_hierarchy['fetched'])}, "
+                         f"revalidating {self.hierarchy_sample:.0%} of it in the background")
+                page_jobs = hierarchy_pages(self.cached_hierarchy)
+                revalidation = background.submit(self.revalidate_hierarchy, self.cached_hierarchy)
+            else:
+                self.stats['hierarchy'] = 'discovered'
+                departments = self.get_departments()
+                self.end_phase('departments', started)
+                if not departments:
+                    self.log("No departments found!", logging.ERROR)
+                    return False
+                branches = self.discover(departments, pool.map, timed=True)
+                if self.aborted:
+                    return False
+                for branch in branches:
+                    self.log(f"Department: {branch['name']} ({len(branch['years'])} years)", logging.DEBUG)
+                self.hierarchy = {'fetched': time.time(), 'sample_offset': 0, 'departments': branches}
+                page_jobs = hierarchy_pages(self.hierarchy)
+            self.stats['pages'] = len(page_jobs)
+            # Timetable page for every group: fetched here, parsed and merged down the pipeline
+            def scrape_page(job):
+                return self.scrape_schedule_simple(*job)
+            phase_started = time.perf_counter()
+            self.start_pipeline(concurrency)
+            try:
+                list(pool.map(scrape_page, page_jobs))
+                if revalidation is not None:
+                    self.hierarchy = revalidation.result()
+                    known = set(page_jobs)
+                    new_jobs = [job for job in hierarchy_pages(self.hierarchy) if job not in known]
+                    if new_jobs and not self.aborted:
+                        self.log(f"Revalidation found {len(new_jobs)} groups missing from the cached hierarchy")
+                        with self._lock:
+                            self.stats['pages'] += len(new_jobs)
+                        list(pool.map(scrape_page, new_jobs))
+            finally:
+                self.stop_pipeline()
+            self.end_phase('pages', phase_started)
+        if self.aborted:
+            return False
+        # Ingest: merge consecutive hours of a class and classes shared by several groups
+        phase_started = time.perf_counter()
+        self.schedule_data, report = coalesce_schedule(self.schedule_data)
+        self.end_phase('ingest', phase_started)
+        self.stats['ingest'] = report
+        self.log(f"Coalesced {report['entries_before']} entries into {report['entries_after']} "
+                 f"({report['json_bytes_before'] // 1024} KB -> {report['json_bytes_after'] // 1024} KB of JSON)")
+        self.stats['wall_time'] = round(time.perf_counter() - started, 3)
+        self.log(f"Faculty scraping complete! Found {len(self.schedule_data.halls)} unique halls.")
+        self.log(f"Refresh took {self.stats['wall_time']}s for {self.stats['pages']} pages "
+                 f"({self.stats['requests']} requests, {self.stats['hierarchy_requests']} of them for the "
+                 f"{self.stats['hierarchy']} hierarchy, {self.stats['failed_pages']} failed pages)")
+        self.log(f"Pages re-parsed: {self.stats['pages_parsed']}, unchanged and skipped: {self.stats['pages_skipped']}")
+        self.log("Time per phase: " + ', '.join(f"{phase} {seconds}s" for phase, seconds in self.stats['phases'].items()))
+        self.log("Stage throughput: " + ', '.join(
+            f"{stage} {totals['pages_per_second']} pages/s ({totals['workers']} workers)"
+            for stage, totals in self.stats['stages'].items()) +
+            f"; merge queue peaked at {self.stats['merge_queue_peak']}/{PIPELINE_DEPTH}")
+        return True
+
+    def discover(self, departments, map_=map, timed=False):
+        """Hierarchy branches of `departments`: {'value', 'name', 'years': {year: [groups]}}.
+
+        Years or groups whose request failed are None. `map_` runs the
+        requests (pool.map to run them in parallel); `timed` records the
+        years and groups phases.
+        """
+        phase_started = time.perf_counter()
+        dept_years = list(map_(self.get_years, [d['value'] for d in departments]))
+        if timed:
+            self.end_phase('years', phase_started)
+        year_jobs = [(dept, year) for dept, years in zip(departments, dept_years) for year in years or ()]
+        phase_started = time.perf_counter()
+        year_groups = list(map_(lambda job: self.get_groups(job[0]['value'], job[1]), year_jobs))
+        if timed:
+            self.end_phase('groups', phase_started)
+        branches = {}
+        for dept, years in zip(departments, dept_years):
+            branches[dept['value']] = {'value': dept['value'], 'name': dept['name'],
+                                       'years': None if years is None else {}}
+        for (dept, year), groups in zip(year_jobs, year_groups):
+            branches[dept['value']]['years'][year] = groups
+        if timed:
+            # A full discovery has nothing to fall back on: failed requests count as empty
+            for branch in branches.values():
+                branch['years'] = {year: groups or [] for year, groups in (branch['years'] or {}).items()}
+        return list(branches.values())
+
+    def revalidate_hierarchy(self, cached):
+        """The cached hierarchy, checked against the timetable server.
+
+        The department list is re-fetched, and the years and groups of new
+        departments and of the next `hierarchy_sample` share of the cached
+        ones (rotating, so every branch comes up in turn). Departments that
+        disappeared are dropped; branches that weren't sampled, or whose
+        requests failed, stay as cached. 'fetched' only moves forward when
+        every branch was revalidated, so the TTL still bounds staleness.
+        """
+        started = time.perf_counter()
         departments = self.get_departments()
         if not departments:
-            self.log("No departments found!")
-            return False
+            self.log("Could not revalidate the hierarchy, keeping the cached one", logging.WARNING)
+            return cached
+        branches = {branch['value']: branch for branch in cached['departments']}
+        known = [dept for dept in departments if dept['value'] in branches]
+        count = min(len(known), math.ceil(len(known) * self.hierarchy_sample))
+        offset = cached.get('sample_offset', 0) % len(known) if known else 0
+        sample = (known[offset:] + known[:offset])[:count]
+        new = [dept for dept in departments if dept['value'] not in branches]
+        fresh = {branch['value']: branch for branch in self.discover(new + sample)}
+        updated = []
         for dept in departments:
-            dept_val = dept['value']
-            dept_name = dept['name']
-            self.log(f"Department: {dept_name}")
-            # Get years for department
-            try:
-                years_resp = requests.get(f"{self.base_url}/getYear/{dept_val}", timeout=10)
-                years_soup = BeautifulSoup(years_resp.content, 'html.parser')
-                years = [opt.get('value') for opt in years_soup.find_all('option') if opt.get('value') and opt.get('value') != '0']
-            except Exception as e:
-                self.log(f"  Error fetching years: {e}")
-                continue
-            for year in years:
-                # Get groups for department/year
-                try:
-                    groups_resp = requests.get(f"{self.base_url}/getGroup/{dept_val}/{year}", timeout=10)
-                    groups_soup = BeautifulSoup(groups_resp.content, 'html.parser')
-                    groups = [opt.get('value') for opt in groups_soup.find_all('option') if opt.get('value') and opt.get('value') != '0']
-                except Exception as e:
-                    self.log(f"    Error fetching groups: {e}")
-                    continue
-                for group in groups:
-                    self.log(f"  Scraping: {dept_name} - {year} - {group}")
-                    self.scrape_schedule_simple(dept_val, year, group)
-        self.log(f"\nFaculty scraping complete! Found {len(self.halls)} unique halls.")
-        return True
-    def __init__(self, base_url):
+            years = dict(branches.get(dept['value'], {'years': {}})['years'])
+            branch = fresh.get(dept['value'])
+            if branch is not None and branch['years'] is not None:
+                years = {year: groups if groups is not None else years.get(year, [])
+                         for year, groups in branch['years'].items()}
+            updated.append({'value': dept['value'], 'name': dept['name'], 'years': years})
+        self.stats['revalidated_departments'] = len(fresh)
+        self.end_phase('revalidate', started)
+        self.log(f"Revalidated {len(sample)} of {len(known)} cached departments and {len(new)} new ones")
+        return {
+            'fetched': time.time() if count == len(known) else cached['fetched'],
+            'sample_offset': (offset + count) % len(known) if known else 0,
+            'departments': updated,
+        }
+
+    def __init__(self, base_url, concurrency=SCRAPE_CONCURRENCY, per_host=SCRAPE_PER_HOST, previous_pages=None,
+                 recorder=None, deadline=REFRESH_DEADLINE, hierarchy=None, hierarchy_sample=HIERARCHY_SAMPLE,
+                 parse_processes=True, budget=None):
         self.base_url = base_url
-        self.schedule_data = defaultdict(lambda: defaultdict(list))
-        self.halls = set()
-        self.debug_info = []
+        # Optional replay.Recorder that keeps a copy of every response
+        self.recorder = recorder
+        self.schedule_data = Schedule()
+        # Bounded, structured log of this crawl plus one summary record per timetable page
+        self.debug_info = deque(maxlen=SCRAPE_LOG_BUFFER)
+        self.page_log = []
+        self.concurrency = concurrency
+        self.per_host = per_host
+        # Per-page hash/validators/parsed entries: from the last crawl (input) and this crawl (output)
+        self.previous_pages = previous_pages or {}
+        self.pages = {}
+        # Department/year/group tree: cached from an earlier crawl (input, optional) and for the next one (output)
+        self.cached_hierarchy = hierarchy
+        self.hierarchy_sample = hierarchy_sample
+        self.hierarchy = None
+        self.stats = {'requests': 0, 'hierarchy_requests': 0, 'retries': 0, 'pages': 0, 'pages_done': 0, 'pages_parsed': 0,
+                      'pages_skipped': 0, 'failed_pages': 0, 'errors': 0, 'wall_time': None, 'phases': {},
+                      'aborted': None, 'hierarchy': None, 'revalidated_departments': 0, 'merge_queue_peak': 0,
+                      'stages': {stage: {'pages': 0, 'busy_seconds': 0.0} for stage in ('fetch', 'parse', 'merge')}}
+        # Page pipeline: fetch threads -> parse processes (acquire_parse_pool, unless
+        # parse_processes is False) -> one merge thread (see start_pipeline)
+        self.parse_processes = parse_processes
+        self.parse_pool = None
+        self.merge_queue = None
+        # Deadline (time.monotonic) and circuit breaker state of this crawl
+        self.deadline_seconds = deadline
+        self.deadline = None
+        self.aborted = None
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+        # Request caps, shared with other crawls when given; else just this crawl's per-host cap
+        self.budget = budget or UpstreamBudget(0, per_host)
+        # One keep-alive session for the whole crawl; the pool is sized so no worker waits for a socket
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(concurrency, per_host))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
-    def log(self, message):
-        print(message)
-        self.debug_info.append(message)
+    def log(self, message, level=logging.INFO, exc_info=False):
+        """Keep a record in debug_info and hand it to scrape_logger (with the traceback if exc_info)"""
+        if level >= logging.ERROR:
+            with self._lock:
+                self.stats['errors'] += 1
+        if level < SCRAPE_LOG_LEVEL:
+            return
+        # deque.append is atomic, and output is handed to the log listener thread
+        self.debug_info.append({'time': round(time.time(), 3), 'level': logging.getLevelName(level), 'message': message})
+        scrape_logger.log(level, message, exc_info=exc_info)
+
+    def end_phase(self, phase, started):
+        """Record how long a crawl phase took, in stats and in the phase histogram"""
+        seconds = time.perf_counter() - started
+        self.stats['phases'][phase] = round(seconds, 3)
+        REFRESH_PHASE_SECONDS.labels(phase).observe(seconds)
+
+    def abort(self, reason):
+        """Stop the crawl: every later request raises RefreshAborted"""
+        with self._lock:
+            if self.aborted:
+                return
+            self.aborted = self.stats['aborted'] = reason
+        self.log(f"✗ Refresh aborted: {reason}", logging.ERROR)
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.abort(f"deadline of {self.deadline_seconds:g}s exceeded")
+        if self.aborted:
+            raise RefreshAborted(self.aborted)
+
+    def _backoff(self, attempt, response):
+        """Seconds to wait before retry number `attempt` + 1, or None if the deadline doesn't allow it"""
+        delay = random.uniform(0, min(SCRAPE_BACKOFF_MAX, SCRAPE_BACKOFF * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), SCRAPE_BACKOFF_MAX))
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            return None
+        return delay
+
+    def _record_outcome(self, ok):
+        """Circuit breaker: too many failed requests in a row means the upstream is down"""
+        with self._lock:
+            self._consecutive_failures = 0 if ok else self._consecutive_failures + 1
+            tripped = self._consecutive_failures >= SCRAPE_BREAKER_THRESHOLD
+        if tripped:
+            self.abort(f"circuit breaker open after {SCRAPE_BREAKER_THRESHOLD} failed requests in a row")
+
+    def _request(self, method, url, endpoint, **kwargs):
+        """Send a request through the shared session, within the upstream budget.
+
+        Transport errors and 429/5xx answers are retried with jittered
+        backoff (outside the budget's slots) while the deadline allows;
+        the last answer or error is returned or raised. `endpoint`
+        (departments, years, groups, schedule) labels the metrics.
+        """
+        attempt = 0
+        while True:
+            self._check_deadline()
+            timeout = REQUEST_TIMEOUT
+            if self.deadline is not None:
+                timeout = max(0.1, min(timeout, self.deadline - time.monotonic()))
+            with self._lock:
+                self.stats['requests'] += 1
+                if endpoint != 'schedule':
+                    self.stats['hierarchy_requests'] += 1
+            response = error = None
+            with self.budget.slot(url):
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except requests.RequestException as e:
+                    error = e
+                finally:
+                    UPSTREAM_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+            UPSTREAM_REQUESTS.labels(endpoint, response.status_code if response is not None else 'error').inc()
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            delay = self._backoff(attempt, response) if failed and attempt < SCRAPE_RETRIES else None
+            if delay is None:
+                break
+            attempt += 1
+            with self._lock:
+                self.stats['retries'] += 1
+            UPSTREAM_RETRIES.labels(endpoint).inc()
+            self.log(f"Retrying {method} {url} in {delay:.2f}s ({error or response.status_code})", logging.DEBUG)
+            time.sleep(delay)
+        self._record_outcome(not failed)
+        if error is not None:
+            raise error
+        if self.recorder is not None and not failed:
+            self.recorder.record(method, url, kwargs.get('data'), response)
+        return response
     
     def test_connection(self):
         """Test if we can connect to the website"""
         try:
             self.log(f"Testing connection to {self.base_url}/student")
-            response = requests.get(f"{self.base_url}/student", timeout=10)
+            response = self._request('GET', f"{self.base_url}/student", 'departments')
             self.log(f"Status code: {response.status_code}")
             
             if response.status_code == 200:
@@ -73,17 +521,18 @@ class ScheduleScraper:
                 self.log("Saved page to test_page.html for inspection")
                 return True
             else:
-                self.log(f"✗ Connection failed with status {response.status_code}")
+                self.log(f"✗ Connection failed with status {response.status_code}", logging.ERROR)
                 return False
         except Exception as e:
-            self.log(f"✗ Connection error: {str(e)}")
+            self.log(f"✗ Connection error: {str(e)}", logging.ERROR)
             return False
     
     def get_departments(self):
         """Scrape list of all departments"""
         try:
-            self.log("\n=== Fetching Departments ===")
-            response = requests.get(f"{self.base_url}/student", timeout=10)
+            self.log("=== Fetching Departments ===")
+            response = self._request('GET', f"{self.base_url}/student", 'departments')
+            response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
             
             dept_select = soup.find('select', {'id': 'ddlDega'})
@@ -99,25 +548,63 @@ class ScheduleScraper:
                         })
                 
                 self.log(f"Found {len(departments)} departments")
-                for dept in departments[:3]:  # Show first 3
-                    self.log(f"  - {dept['name']}")
-                if len(departments) > 3:
-                    self.log(f"  ... and {len(departments) - 3} more")
+                for dept in departments:
+                    self.log(f"  - {dept['name']}", logging.DEBUG)
             else:
-                self.log("✗ Could not find department dropdown")
+                self.log("✗ Could not find department dropdown", logging.ERROR)
             
             return departments
+        except RefreshAborted:
+            return []
         except Exception as e:
-            self.log(f"✗ Error fetching departments: {e}")
+            self.log(f"✗ Error fetching departments: {e}", logging.ERROR)
             return []
+
+    def _get_options(self, url, endpoint):
+        response = self._request('GET', url, endpoint)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+        return [opt.get('value') for opt in soup.find_all('option') if opt.get('value') and opt.get('value') != '0']
+
+    def get_years(self, department):
+        """Scrape the years offered by a department; None if the request failed"""
+        try:
+            return self._get_options(f"{self.base_url}/getYear/{department}", 'years')
+        except RefreshAborted:
+            return None
+        except Exception as e:
+            self.log(f"Error fetching years for {department}: {e}", logging.ERROR)
+            return None
+
+    def get_groups(self, department, year):
+        """Scrape the groups of a department/year; None if the request failed"""
+        try:
+            return self._get_options(f"{self.base_url}/getGroup/{department}/{year}", 'groups')
+        except RefreshAborted:
+            return None
+        except Exception as e:
+            self.log(f"Error fetching groups for {department} / {year}: {e}", logging.ERROR)
+            return None
     
+    @staticmethod
+    def page_key(department, year, group):
+        return '\t'.join((department, year, group))
+
     def scrape_schedule_simple(self, department, year, group):
-        """Simple version - scrape one schedule and show what we find"""
+        """Fetch stage for one timetable page.
+
+        The page is requested with the validators of the previous crawl.
+        If it is unchanged (304, or same content hash) its previous records
+        go straight to the merge stage, otherwise its raw bytes go through
+        the parse stage first. Returns False if the page couldn't be
+        fetched; the page's summary record is completed by the merge stage.
+        """
+        key = self.page_key(department, year, group)
+        summary = {'page': f"{department} / {year} / {group}", 'status': 'failed',
+                   'classes': 0, 'halls': 0, 'fetch_ms': None, 'parse_ms': None}
+        started = time.perf_counter()
         try:
-            self.log(f"\n=== Scraping Schedule ===")
-            self.log(f"Department: {department}")
-            self.log(f"Year: {year}")
-            self.log(f"Group: {group}")
+            self.log(f"Scraping schedule: {department} - {year} - {group}", logging.DEBUG)
             
             # POST request to get schedule
             data = {
@@ -126,90 +613,145 @@ class ScheduleScraper:
                 'paraleli': group,
                 'submit': 'Afisho'
             }
+            cached = self.previous_pages.get(key)
+            headers = {}
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
             
-            response = requests.post(f"{self.base_url}/student", data=data, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Save this schedule for inspection
-            with open('schedule_test.html', 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            self.log("Saved schedule to schedule_test.html")
-            
-            # Find the schedule table
-            table = soup.find('table', {'class': 'contentTextFormat'})
-            if not table:
-                self.log("✗ Could not find schedule table")
-                return False
-            
-            self.log("✓ Found schedule table")
-            
-            # Parse the table structure
-            days = ['E Hënë', 'E Martë', 'E Mërkurë', 'E Enjte', 'E Premte']
-            rows = table.find_all('tr')
-            
-            self.log(f"Table has {len(rows)} rows")
-            
-            # Skip first 2 rows (headers)
-            for row_idx, row in enumerate(rows[2:], start=0):
-                th = row.find('th')
-                if not th:
-                    continue
-                    
-                time_slot = th.text.strip()
-                cells = row.find_all('td', {'class': 'bodyTd'})
-                
-                for day_idx, cell in enumerate(cells):
-                    if day_idx >= len(days):
-                        break
-                    
-                    cell_text = cell.text.strip()
-                    
-                    # Skip empty cells
-                    if not cell_text or cell_text == '&nbsp' or cell_text == '':
-                        continue
-                    
-                    self.log(f"\nFound class:")
-                    self.log(f"  Time: {time_slot}")
-                    self.log(f"  Day: {days[day_idx]}")
-                    self.log(f"  Content: {cell_text[:100]}...")  # First 100 chars
-                    
-                    # Try to extract hall information using regex (look for Salla or Klasa)
-                    import re
-                    lines = [line.strip() for line in cell_text.split('\n') if line.strip()]
-                    hall = None
-                    for line in reversed(lines):
-                        match = re.search(r'(Salla|Klasa)\s*\(?([\w\d\-]+)\)?', line, re.IGNORECASE)
-                        if match:
-                            hall = match.group(0).strip()
-                            # Clean up hall name (remove extra spaces, normalize)
-                            hall = re.sub(r'\s+', ' ', hall)
-                            break
-                    if hall:
-                        self.log(f"  Hall detected: {hall}")
-                        self.halls.add(hall)
-                        # Store schedule entry
-                        day = days[day_idx]
-                        if '-' in time_slot:
-                            start_time, end_time = time_slot.split('-')
-                            self.schedule_data[day][hall].append({
-                                'start': start_time.strip(),
-                                'end': end_time.strip(),
-                                'subject': lines[0] if lines else "Unknown",
-                                'professor': lines[1] if len(lines) > 1 else "Unknown",
-                                'group': f"{year} - {group}"
-                            })
-            
-            self.log(f"\n✓ Scraping complete! Found {len(self.halls)} unique halls")
-            for hall in list(self.halls)[:5]:
-                self.log(f"  - {hall}")
-            
+            response = self._request('POST', f"{self.base_url}/student", 'schedule', data=data, headers=headers)
+            summary['fetch_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            if response.status_code != 304:
+                response.raise_for_status()
+            if cached and response.status_code == 304:
+                digest = cached['hash']
+            else:
+                digest = hashlib.sha256(response.content).hexdigest()
+            page = {
+                'hash': digest,
+                'etag': response.headers.get('ETag') or (cached or {}).get('etag'),
+                'last_modified': response.headers.get('Last-Modified') or (cached or {}).get('last_modified'),
+            }
+            # Before parse(): without parser processes it parses right here, which is the parse stage's time
+            self._stage_done('fetch', started)
+            if cached and cached['hash'] == digest:
+                summary['status'] = 'skipped'
+                parsed = (cached['entries'], None)
+            else:
+                summary['status'] = 'parsed'
+                parsed = self.parse(response.content, year, group)
+            self.merge_queue.put((key, summary, page, parsed))
+            with self._lock:
+                self.stats['merge_queue_peak'] = max(self.stats['merge_queue_peak'], self.merge_queue.qsize())
             return True
             
+        except RefreshAborted:
+            summary['status'] = 'aborted'
         except Exception as e:
-            self.log(f"✗ Error scraping schedule: {e}")
-            import traceback
-            self.log(traceback.format_exc())
-            return False
+            summary['status'] = 'failed'
+            summary['error'] = str(e)
+            self.log(f"✗ Error scraping schedule {summary['page']}: {e}", logging.ERROR, exc_info=True)
+        self.finish_page(summary)
+        return False
+
+    def parse(self, content, year, group):
+        """Parse stage: a Future from the parser processes, or (records, seconds) when there are none"""
+        pool = self.parse_pool
+        if pool is not None:
+            try:
+                return pool.submit(parse_page, content, year, group, PARSER_BACKEND)
+            except BrokenProcessPool:
+                # A parser process died (e.g. killed for memory): parse in the fetch threads from now on
+                self.parse_pool = None
+                self.log("Parser processes are gone, parsing the remaining pages in the fetch threads",
+                         logging.WARNING)
+        return parse_page(content, year, group, PARSER_BACKEND)
+
+    def merge_pages(self):
+        """Merge stage: the one thread that adds parsed pages to schedule_data and pages.
+
+        Takes pages in the order they were fetched, waiting for their parse
+        if it is still running, until the None that ends the crawl.
+        """
+        while True:
+            item = self.merge_queue.get()
+            if item is None:
+                return
+            key, summary, page, parsed = item
+            try:
+                records, parse_seconds = parsed.result() if isinstance(parsed, Future) else parsed
+                started = time.perf_counter()
+                if parse_seconds is not None:
+                    PARSE_SECONDS.observe(parse_seconds)
+                    summary['parse_ms'] = round(parse_seconds * 1000, 2)
+                    self._stage_done('parse', seconds=parse_seconds)
+                if records is None:
+                    summary['status'] = 'no table'
+                    self.log(f"✗ Could not find schedule table: {summary['page']}", logging.WARNING)
+                else:
+                    page['entries'] = records
+                    self.pages[key] = page
+                    for record in records:
+                        self.schedule_data.add_hall(record[1])
+                        if record[0] is not None:
+                            day, hall, start, end, subject, professor, group = record
+                            self.schedule_data.add(day, hall, start, end, subject, professor, (group,))
+                    with self._lock:
+                        self.stats[f"pages_{summary['status']}"] += 1
+                    summary['classes'] = sum(1 for record in records if record[0] is not None)
+                    summary['halls'] = len({record[1] for record in records})
+                    self.log(f"✓ {summary['page']}: {summary['status']}, "
+                             f"{summary['classes']} classes in {summary['halls']} halls")
+                self._stage_done('merge', started)
+            except Exception as e:
+                summary['status'] = 'failed'
+                summary['error'] = str(e)
+                self.log(f"✗ Error parsing schedule {summary['page']}: {e}", logging.ERROR)
+            self.finish_page(summary)
+
+    def finish_page(self, summary):
+        """A page has left the pipeline: count it and keep its summary"""
+        PAGES.labels(summary['status']).inc()
+        self.page_log.append(summary)
+        with self._lock:
+            self.stats['pages_done'] += 1
+            if summary['status'] not in ('parsed', 'skipped'):
+                self.stats['failed_pages'] += 1
+
+    def _stage_done(self, stage, started=None, seconds=None):
+        """Add one page and its time to a pipeline stage's totals"""
+        if seconds is None:
+            seconds = time.perf_counter() - started
+        with self._lock:
+            totals = self.stats['stages'][stage]
+            totals['pages'] += 1
+            totals['busy_seconds'] += seconds
+
+    def start_pipeline(self, concurrency):
+        """Pick the parse processes (if any) and start the merge thread for the timetable pages"""
+        self.merge_queue = queue.Queue(maxsize=max(1, PIPELINE_DEPTH))
+        self.parse_pool = acquire_parse_pool() if self.parse_processes else None
+        self._pool_acquired = self.parse_pool is not None
+        parse_workers = PARSE_WORKERS if self.parse_pool is not None else concurrency
+        self._stage_workers = {'fetch': concurrency, 'parse': parse_workers, 'merge': 1}
+        self.merger = threading.Thread(target=self.merge_pages, name='merge', daemon=True)
+        self.merger.start()
+
+    def stop_pipeline(self):
+        """Wait for every page in flight to be merged, then report each stage's throughput"""
+        self.merge_queue.put(None)
+        self.merger.join()
+        if self._pool_acquired:
+            self._pool_acquired = False
+            release_parse_pool()
+        for stage, totals in self.stats['stages'].items():
+            totals['workers'] = self._stage_workers[stage]
+            totals['busy_seconds'] = round(totals['busy_seconds'], 3)
+            # Pages per second the stage could sustain with all of its workers busy
+            totals['pages_per_second'] = (round(totals['pages'] * totals['workers'] / totals['busy_seconds'], 1)
+                                          if totals['busy_seconds'] else None)
 
 
 
@@ -322,9 +864,168 @@ HTML_TEMPLATE = """
         <div id=\"loading\" class=\"loading\" style=\"display:none;\"><div class=\"spinner\"></div>Po ngarkohen të dhënat...</div>
     </div>
     <script>
-        let scheduleData = {};
-        let hallsList = [];
         let searchTriggered = false;
+        // Today's day shard or free-hall index, when the server inlines it (INDEX_INLINE)
+        const inlineSchedule = /*INLINE_SCHEDULE*/null;
+
+        // Last schedule snapshot ({version, schedule, halls}), kept in localStorage and
+        // brought up to date with /api/schedule?since=<version> on every page load
+        const SCHEDULE_STORAGE_KEY = 'emptyHalls.schedule';
+        let scheduleSnapshot = null;
+
+        function loadStoredSchedule() {
+            try {
+                const stored = JSON.parse(localStorage.getItem(SCHEDULE_STORAGE_KEY));
+                return stored && stored.schedule && stored.halls ? stored : null;
+            } catch (e) {
+                return null;
+            }
+        }
+
+        function storeSchedule(snapshot) {
+            try {
+                localStorage.setItem(SCHEDULE_STORAGE_KEY, JSON.stringify(snapshot));
+            } catch (e) {
+                // Storage full or disabled: the copy in memory still serves this visit
+            }
+        }
+
+        function sameClass(a, b) {
+            return a.start === b.start && a.end === b.end && a.subject === b.subject &&
+                a.professor === b.professor && JSON.stringify(a.groups) === JSON.stringify(b.groups);
+        }
+
+        function applyScheduleDelta(snapshot, delta) {
+            const schedule = snapshot.schedule;
+            Object.entries(delta.changes || {}).forEach(([day, halls]) => {
+                const dayHalls = schedule[day] = schedule[day] || {};
+                Object.entries(halls).forEach(([hall, change]) => {
+                    const classes = dayHalls[hall] || [];
+                    change.removed.forEach(removed => {
+                        const i = classes.findIndex(cls => sameClass(cls, removed));
+                        if (i >= 0) classes.splice(i, 1);
+                    });
+                    classes.push(...change.added);
+                    // Same order as the server: start, end, subject
+                    classes.sort((a, b) => a.start.localeCompare(b.start) || a.end.localeCompare(b.end) ||
+                        a.subject.localeCompare(b.subject));
+                    if (classes.length) dayHalls[hall] = classes; else delete dayHalls[hall];
+                });
+                if (!Object.keys(dayHalls).length) delete schedule[day];
+            });
+            return { version: delta.version, schedule: schedule, halls: delta.halls || snapshot.halls };
+        }
+
+        // Until a snapshot is stored: single days from /api/schedule/<day>, the selected
+        // one first and the others while the browser is idle
+        const dayShards = {};
+        const dayRequests = {};
+
+        function allDays() {
+            return Array.from(document.getElementById('daySelect').options).map(option => option.value);
+        }
+
+        function whenIdle(callback) {
+            if (window.requestIdleCallback) requestIdleCallback(callback, { timeout: 5000 });
+            else setTimeout(callback, 1000);
+        }
+
+        function loadDay(day) {
+            if (!dayRequests[day]) {
+                dayRequests[day] = fetch('/api/schedule/' + encodeURIComponent(day)).then(r => {
+                    if (!r.ok) throw new Error(r.status);
+                    return r.json();
+                }).then(shard => {
+                    dayShards[day] = shard;
+                    assembleSnapshot();
+                    return true;
+                }).catch(() => {
+                    delete dayRequests[day];
+                    return false;
+                });
+            }
+            return dayRequests[day];
+        }
+
+        function prefetchDays() {
+            const day = allDays().find(d => !dayRequests[d]);
+            if (day && !scheduleSnapshot) {
+                loadDay(day).then(ok => { if (ok) whenIdle(prefetchDays); });
+            }
+        }
+
+        function assembleSnapshot() {
+            // Once every day is in, from one version, the days become the stored snapshot
+            const days = allDays();
+            if (scheduleSnapshot || !days.every(day => dayShards[day])) return;
+            const version = Math.max(...days.map(day => dayShards[day].version));
+            const stale = days.filter(day => dayShards[day].version !== version);
+            if (stale.length) {
+                // A refresh happened in between: reload the days fetched before it
+                stale.forEach(day => { delete dayShards[day]; delete dayRequests[day]; loadDay(day); });
+                return;
+            }
+            const schedule = {};
+            days.forEach(day => {
+                if (Object.keys(dayShards[day].schedule).length) schedule[day] = dayShards[day].schedule;
+            });
+            scheduleSnapshot = { version: version, schedule: schedule, halls: dayShards[days[0]].halls };
+            storeSchedule(scheduleSnapshot);
+        }
+
+        function syncSchedule() {
+            const stored = loadStoredSchedule();
+            if (!stored) {
+                if (inlineSchedule && inlineSchedule.schedule) {
+                    dayShards[inlineSchedule.day] = inlineSchedule;
+                    dayRequests[inlineSchedule.day] = Promise.resolve(true);
+                }
+                const day = document.getElementById('daySelect').value;
+                // An inlined free-hall index already answers today's searches: all days can wait
+                if (dayData(day)) return whenIdle(prefetchDays);
+                return loadDay(day).then(() => whenIdle(prefetchDays));
+            }
+            scheduleSnapshot = stored;
+            return fetch('/api/schedule?since=' + stored.version).then(r => r.json()).then(data => {
+                if (data.schedule) {
+                    scheduleSnapshot = data;
+                } else if (scheduleSnapshot && data.since === scheduleSnapshot.version) {
+                    scheduleSnapshot = applyScheduleDelta(scheduleSnapshot, data);
+                } else {
+                    return;
+                }
+                storeSchedule(scheduleSnapshot);
+            }).catch(() => {
+                // Offline or server error: keep using the stored copy, if any
+            });
+        }
+
+        function dayData(day) {
+            // {schedule: {hall: [classes]}, halls} of one day, if it is loaded
+            if (scheduleSnapshot) {
+                return { schedule: scheduleSnapshot.schedule[day] || {}, halls: scheduleSnapshot.halls };
+            }
+            if (dayShards[day]) return dayShards[day];
+            if (inlineSchedule && inlineSchedule.busy && inlineSchedule.day === day) return inlineSchedule;
+            return null;
+        }
+
+        function localFreeHalls(data, time) {
+            // Start inclusive, end exclusive, like the server's index
+            if (data.busy) {
+                // Inlined free-hall index: flat [start, end, ...] busy minutes per hall
+                const minute = Number(time.slice(0, 2)) * 60 + Number(time.slice(3, 5));
+                return data.halls.filter((hall, i) => {
+                    const busy = data.busy[i];
+                    for (let j = 0; j < busy.length; j += 2) {
+                        if (busy[j] <= minute && minute < busy[j + 1]) return false;
+                    }
+                    return true;
+                });
+            }
+            return data.halls.filter(hall =>
+                !(data.schedule[hall] || []).some(cls => cls.start <= time && time < cls.end));
+        }
 
         function showAlert(message, type = 'info') {
             const alerts = document.getElementById('alerts');
@@ -363,10 +1064,10 @@ HTML_TEMPLATE = """
             } else {
                 document.getElementById('daySelect').value = "E Hënë";
             }
-            // Fetch schedule data
-            fetchSchedule();
+            syncSchedule();
             // Add listeners for search trigger
             document.getElementById('daySelect').addEventListener('change', function() {
+                if (!scheduleSnapshot) loadDay(this.value);
                 searchTriggered = true;
                 showSearchButton();
             });
@@ -387,59 +1088,55 @@ HTML_TEMPLATE = """
             findEmptyHalls();
         }
 
-        function timeToMinutes(time) {
-            const [hours, minutes] = time.split(':').map(Number);
-            return hours * 60 + minutes;
-        }
-
-        function isHallOccupied(hall, day, time) {
-            if (!scheduleData[day] || !scheduleData[day][hall]) return null;
-            const timeMinutes = timeToMinutes(time);
-            for (const cls of scheduleData[day][hall]) {
-                const startMinutes = timeToMinutes(cls.start);
-                const endMinutes = timeToMinutes(cls.end);
-                if (timeMinutes >= startMinutes && timeMinutes < endMinutes) {
-                    return cls;
-                }
-            }
-            return null;
-        }
-
         function findEmptyHalls() {
             if (!searchTriggered) {
                 document.getElementById('results').style.display = 'none';
                 return;
             }
-            if (hallsList.length === 0) {
-                document.getElementById('results').style.display = 'none';
-                document.getElementById('alerts').innerHTML = '';
-                showAlert('Nuk ka të dhëna të orarit të publikuara. Ju lutem kontaktoni administratën.', 'warning');
-                return;
-            }
             const day = document.getElementById('daySelect').value;
             const time = document.getElementById('timeSelect').value;
             if (!day || !time) {
                 document.getElementById('results').style.display = 'none';
                 return;
             }
+            // Answered from the stored snapshot or the day's shard when loaded, without a round trip
+            const data = dayData(day);
+            if (data) {
+                renderFreeHalls(localFreeHalls(data, time), data.halls.length);
+                return;
+            }
+            // Otherwise the server answers from its precomputed index, so only the free halls travel
+            document.getElementById('loading').style.display = 'block';
+            const params = new URLSearchParams({ day: day, time: time });
+            fetch('/api/free-halls?' + params).then(r => r.json()).then(data => {
+                document.getElementById('loading').style.display = 'none';
+                renderFreeHalls(data.free || [], data.total || 0);
+            }).catch(() => {
+                document.getElementById('loading').style.display = 'none';
+                showAlert('Gabim gjatë ngarkimit të të dhënave.', 'danger');
+            });
+        }
+
+        function renderFreeHalls(freeHalls, total) {
+            if (total === 0) {
+                document.getElementById('results').style.display = 'none';
+                document.getElementById('alerts').innerHTML = '';
+                showAlert('Nuk ka të dhëna të orarit të publikuara. Ju lutem kontaktoni administratën.', 'warning');
+                return;
+            }
             const grid = document.getElementById('hallGrid');
             grid.innerHTML = '';
             document.getElementById('results').style.display = 'block';
-            let freeCount = 0;
-            hallsList.forEach(hall => {
-                const currentClass = isHallOccupied(hall, day, time);
-                if (!currentClass) {
-                    freeCount++;
-                    const card = document.createElement('div');
-                    card.className = 'hall-card free';
-                    let content = '<div class="hall-name">' + hall + '</div>';
-                    content += '<span class="hall-status status-free">✓ E Lirë</span>';
-                    card.innerHTML = content;
-                    grid.appendChild(card);
-                }
+            freeHalls.forEach(hall => {
+                const card = document.createElement('div');
+                card.className = 'hall-card free';
+                let content = '<div class="hall-name">' + hall + '</div>';
+                content += '<span class="hall-status status-free">✓ E Lirë</span>';
+                card.innerHTML = content;
+                grid.appendChild(card);
             });
-            document.getElementById('totalHalls').textContent = hallsList.length;
-            document.getElementById('freeHalls').textContent = freeCount;
+            document.getElementById('totalHalls').textContent = total;
+            document.getElementById('freeHalls').textContent = freeHalls.length;
             // Hide occupied halls summary if present
             var occ = document.getElementById('occupiedHalls');
             if (occ && occ.parentElement) occ.parentElement.style.display = 'none';
@@ -461,20 +1158,6 @@ HTML_TEMPLATE = """
                 }
             }
         }
-
-        function fetchSchedule() {
-            document.getElementById('loading').style.display = 'block';
-            fetch('/api/schedule').then(r => r.json()).then(data => {
-                scheduleData = data.schedule || {};
-                hallsList = data.halls || [];
-                document.getElementById('loading').style.display = 'none';
-                // Do not show results until user triggers search
-                findEmptyHalls();
-            }).catch(() => {
-                document.getElementById('loading').style.display = 'none';
-                showAlert('Gabim gjatë ngarkimit të të dhënave.', 'danger');
-            });
-        }
     </script>
 </body>
 </html>
@@ -484,38 +1167,708 @@ HTML_TEMPLATE = """
 
 # Global cache for all halls and schedule
 
-import os
 from functools import wraps
 from flask import Response
 
 CACHE_FILE = 'schedule_cache.json'
-faculty_scraper = None
-faculty_schedule = {}
-faculty_halls = []
-faculty_debug = []
-
-def load_cache():
-    global faculty_schedule, faculty_halls, faculty_debug
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            faculty_schedule = data.get('schedule', {})
-            faculty_halls = data.get('halls', [])
-            faculty_debug = data.get('debug', [])
-            print('Loaded schedule cache.')
-    else:
-        print('No cache file found.')
-
-def save_cache():
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump({
-            'schedule': faculty_schedule,
-            'halls': faculty_halls,
-            'debug': faculty_debug
-        }, f, ensure_ascii=False, indent=2)
-        print('Saved schedule cache.')
-
-load_cache()
+# Compact binary copy of the schedule (no debug log) that workers load at startup
+SNAPSHOT_FILE = 'schedule_cache.bin'
+# Content hash, validators and parsed records per timetable page, for incremental refreshes;
+# caches in another format (2 = timetable_parser.parse_page records) are ignored
+PAGE_CACHE_FILE = 'page_cache.json'
+PAGE_CACHE_FORMAT = 2
+# Department/year/group tree of the last crawl, reused while younger than HIERARCHY_TTL
+HIERARCHY_FILE = 'hierarchy_cache.json'
+# Log and per-page summaries of the last crawl, kept apart from the schedule files
+SCRAPE_LOG_FILE = 'scrape_log.json'
+# The files above, the refresh lock and the SQLite history of every faculty but the default
+# one live in FACULTIES_DIR/<key>/
+FACULTIES_DIR = 'faculties'
+# Keys a faculty can't have, as /api/<faculty>/... would shadow or be shadowed by these routes
+RESERVED_FACULTY_KEYS = {'schedule', 'halls', 'analytics', 'snapshots', 'free-halls', 'free-window',
+                         'hall-status', 'refresh-schedule', 'refresh-jobs', 'health', 'faculties'}
+# How long browsers may reuse /api/schedule before revalidating with If-None-Match
+SCHEDULE_MAX_AGE = int(os.environ.get('SCHEDULE_MAX_AGE', '300'))
+# The index page is prebuilt and precompressed. INDEX_INLINE embeds today's data (in INDEX_TIMEZONE)
+# so the first search needs no further request: 'day' (the /api/schedule/<day> shard), 'free'
+# (busy intervals per hall, smaller) or '' (static page)
+INDEX_INLINE = os.environ.get('INDEX_INLINE', '')
+INDEX_MAX_AGE = int(os.environ.get('INDEX_MAX_AGE', '60'))
+INDEX_TIMEZONE = os.environ.get('INDEX_TIMEZONE', 'Europe/Tirane')
+# Hall utilization analytics (needs numpy): opening hours and slot length of the occupancy
+# matrix built for every snapshot; ANALYTICS=0 skips it
+ANALYTICS = os.environ.get('ANALYTICS', '1') == '1'
+DEFAULT_ANALYTICS_HOURS = '08:00-20:00'
+ANALYTICS_HOURS = os.environ.get('ANALYTICS_HOURS', DEFAULT_ANALYTICS_HOURS)
+ANALYTICS_SLOT_MINUTES = int(os.environ.get('ANALYTICS_SLOT_MINUTES', '30'))
+# Versions published by this worker that /api/schedule?since= can diff against (older ones
+# come from the SQLite history if enabled, otherwise the client gets the full schedule)
+DELTA_HISTORY = int(os.environ.get('DELTA_HISTORY', '7'))
+# Seconds between progress events on a refresh job's SSE stream, and between writes of the
+# progress file (REFRESH_JOB_FILE) that lets every worker answer for a job; a stream ends after
+# REFRESH_EVENTS_MAX_SECONDS and the browser's EventSource reconnects. A stream holds a gunicorn
+# sync worker the whole time, so keep this below --timeout, or run gthread/gevent workers
+REFRESH_EVENT_INTERVAL = float(os.environ.get('REFRESH_EVENT_INTERVAL', '1'))
+REFRESH_EVENTS_MAX_SECONDS = float(os.environ.get('REFRESH_EVENTS_MAX_SECONDS', '20'))
+REFRESH_JOB_FILE = 'refresh_job.json'
+# Multi-worker coordination: only the holder of SCHEDULER_LOCK_FILE runs the nightly crawl,
+# REFRESH_LOCK_FILE is held by whichever worker is crawling, and every worker checks the
+# snapshot file for a newer version at most every SNAPSHOT_CHECK_INTERVAL seconds
+SCHEDULER_LOCK_FILE = 'scheduler.lock'
+REFRESH_LOCK_FILE = 'refresh.lock'
+WORKER_STATE_DIR = 'worker_state'
+# Every worker dumps its metrics here at most every METRICS_DUMP_INTERVAL seconds while it is
+# busy, and /metrics on any worker merges the dumps of all live ones
+METRICS_DIR = os.path.join(WORKER_STATE_DIR, 'metrics')
+METRICS_DUMP_INTERVAL = float(os.environ.get('METRICS_DUMP_INTERVAL', '5'))
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('SNAPSHOT_CHECK_INTERVAL', '5'))
+# Optional SQLite (WAL) history of published snapshots, e.g. SCHEDULE_DB=schedule.db, keeping
+# the last SCHEDULE_DB_HISTORY versions; QUERY_BACKEND=sqlite answers the free-hall endpoints from it
+SCHEDULE_DB = os.environ.get('SCHEDULE_DB', '')
+SCHEDULE_DB_HISTORY = int(os.environ.get('SCHEDULE_DB_HISTORY', '20'))
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'index')
+
+
+INLINE_PLACEHOLDER = '/*INLINE_SCHEDULE*/null'
+
+
+def build_index_page(inline_json='null'):
+    """The index page as bytes, with `inline_json` as its inlineSchedule"""
+    # Nothing in the JSON may close the script element
+    inline_json = inline_json.replace('</', '<\\/').replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return HTML_TEMPLATE.replace(INLINE_PLACEHOLDER, inline_json).encode('utf-8')
+
+
+def current_day():
+    """The day the page opens on: today in INDEX_TIMEZONE, Monday at weekends, like its script"""
+    try:
+        now = datetime.now(ZoneInfo(INDEX_TIMEZONE))
+    except (ZoneInfoNotFoundError, ValueError):
+        now = datetime.now()
+    return DAYS[now.weekday()] if now.weekday() < len(DAYS) else DAYS[0]
+
+
+STATIC_INDEX_PAGE = PrecompressedBody(build_index_page(), mimetype='text/html', static=True)
+
+
+def opening_hours(value):
+    """(opens, closes) in minutes of an 'HH:MM-HH:MM' setting; the default hours, with a warning,
+    if it is malformed"""
+    try:
+        opens, closes = (time_to_minutes(part) for part in value.split('-'))
+        if opens >= closes:
+            raise ValueError('closes before it opens')
+        return opens, closes
+    except ValueError as e:
+        print(f'Ignoring ANALYTICS_HOURS={value!r} ({e}), using {DEFAULT_ANALYTICS_HOURS}.')
+        return opening_hours(DEFAULT_ANALYTICS_HOURS)
+
+
+# Checked once here rather than on every snapshot build
+ANALYTICS_OPENS, ANALYTICS_CLOSES = opening_hours(ANALYTICS_HOURS)
+if ANALYTICS_SLOT_MINUTES <= 0:
+    print(f'Ignoring ANALYTICS_SLOT_MINUTES={ANALYTICS_SLOT_MINUTES}, using 30.')
+    ANALYTICS_SLOT_MINUTES = 30
+
+
+def build_analytics(schedule):
+    """Utilization analytics of a schedule, or None if disabled or numpy is missing"""
+    if not ANALYTICS or not ANALYTICS_AVAILABLE:
+        return None
+    return Analytics(schedule, DAYS, ANALYTICS_OPENS, ANALYTICS_CLOSES, ANALYTICS_SLOT_MINUTES)
+
+
+class ScheduleSnapshot:
+    """One version of the schedule with everything served from it.
+
+    The free-hall index and the encoded /api/schedule bodies are built here
+    once, not per request. A snapshot is never modified after construction;
+    refreshes build a new one and swap the `Faculty.snapshot` reference, so a
+    request that reads it once sees one consistent version.
+    """
+
+    def __init__(self, schedule, version=0):
+        self.schedule = schedule
+        self.halls = schedule.halls
+        self.version = version
+        self.index = HallIndex(schedule)
+        # The dict form only exists while it is encoded; the model is what stays in memory
+        self.payload = PrecompressedBody.from_json({'version': version, 'schedule': schedule.to_json(),
+                                                    'halls': schedule.halls})
+        self.analytics = build_analytics(schedule)
+        # /api/schedule?since= bodies by base version and the per-hall shards, encoded on first
+        # request; the per-day shards are built by Faculty.publish
+        self.deltas = {}
+        self.shards = {}
+        self.created = time.time()
+        self.model_bytes = None
+
+    def memory_bytes(self):
+        """Approximate memory held: the model and index, plus every body encoded so far"""
+        if self.model_bytes is None:
+            self.model_bytes = self.schedule.memory_bytes() + self.index.memory_bytes()
+        bodies = {id(body): body for body in [self.payload, *list(self.deltas.values()), *list(self.shards.values())]}
+        return self.model_bytes + sum(size for body in bodies.values() for size in body.sizes().values())
+
+    def day_shard(self, day):
+        """Body of /api/schedule/<day>: that day's classes in every hall"""
+        body = self.shards.get(('day', day))
+        if body is None:
+            body = self.shards[('day', day)] = PrecompressedBody.from_json({
+                'version': self.version,
+                'day': day,
+                'schedule': {hall: [entry.to_dict() for entry in classes]
+                             for hall, classes in self.schedule.days.get(day, {}).items()},
+                'halls': self.halls,
+            })
+        return body
+
+    def analytics_view(self, view):
+        """Body of /api/analytics/<view>"""
+        body = self.shards.get(('analytics', view))
+        if body is None:
+            body = self.shards[('analytics', view)] = PrecompressedBody.from_json(
+                dict(self.analytics.views[view], version=self.version))
+        return body
+
+    def free_index(self, day):
+        """Compact free-hall index of one day: merged busy intervals per hall, flattened"""
+        intervals = self.index.intervals.get(day)
+        return {
+            'version': self.version,
+            'day': day,
+            'halls': self.index.halls,
+            'busy': [[minute for span in zip(starts, ends) for minute in span] for starts, ends in intervals]
+                    if intervals else [[] for _ in self.index.halls],
+        }
+
+    def index_page(self, day, inline):
+        """The index page with `day`'s shard ('day') or free-hall index ('free') inlined"""
+        body = self.shards.get(('index', inline, day))
+        if body is None:
+            if inline == 'day':
+                data = self.day_shard(day).bodies['identity'].decode('utf-8')
+            else:
+                data = json.dumps(self.free_index(day), ensure_ascii=False, separators=(',', ':'))
+            body = self.shards[('index', inline, day)] = PrecompressedBody(build_index_page(data), mimetype='text/html')
+        return body
+
+    def hall_shard(self, hall):
+        """Body of /api/halls/<hall>: one hall's classes on every day.
+
+        Encoded on first request: there are as many as halls, and each is
+        about 1/halls of the schedule, so building one costs far less than
+        a day shard (about a millisecond for a 10x faculty).
+        """
+        body = self.shards.get(('hall', hall))
+        if body is None:
+            body = self.shards[('hall', hall)] = PrecompressedBody.from_json({
+                'version': self.version,
+                'hall': hall,
+                'schedule': {day: [entry.to_dict() for entry in day_halls[hall]]
+                             for day, day_halls in self.schedule.days.items() if hall in day_halls},
+            })
+        return body
+
+    def delta(self, since, base):
+        """Body for a client holding version `since` (whose schedule is `base`).
+
+        {'version', 'since', 'unchanged': true} if nothing differs, else
+        {'version', 'since', 'changes'} (see schedule_delta) plus 'halls'
+        when the hall list changed. Falls back to the full payload when the
+        delta wouldn't be smaller.
+        """
+        body = self.deltas.get(since)
+        if body is None:
+            data = {'version': self.version, 'since': since}
+            changes = schedule_delta(base, self.schedule) if since != self.version else {}
+            if base.halls != self.halls:
+                data['halls'] = self.halls
+            if changes:
+                data['changes'] = changes
+            elif 'halls' not in data:
+                data['unchanged'] = True
+            body = PrecompressedBody.from_json(data)
+            if len(body.bodies['identity']) >= len(self.payload.bodies['identity']):
+                body = self.payload
+            self.deltas[since] = body
+        return body
+
+
+def parse_faculties(value):
+    """[(key, base_url)] of the FACULTIES setting, the default faculty first"""
+    sources = []
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        key, _, url = (part.strip() for part in item.partition('='))
+        if not key or not url:
+            raise ValueError(f"FACULTIES expects 'key=url' pairs, got {item!r}")
+        if not all(c.isalnum() or c in '-_' for c in key) or key in RESERVED_FACULTY_KEYS:
+            raise ValueError(f"Unusable faculty key {key!r} (it is part of the /api/<faculty>/... routes)")
+        if key in (k for k, _ in sources):
+            raise ValueError(f"Faculty {key!r} appears twice in FACULTIES")
+        sources.append((key, url))
+    return sources or [(DEFAULT_FACULTY, BASE_URL)]
+
+
+class Faculty:
+    """One timetable source: its crawls, its files and the snapshot this worker serves for it.
+
+    The default faculty keeps the original file names in the working
+    directory, the others the same names in faculties/<key>/. Refreshes
+    build a new snapshot and swap the `snapshot` reference.
+    """
+
+    def __init__(self, key, base_url, default=False):
+        self.key = key
+        self.base_url = base_url
+        self.default = default
+        self.directory = '' if default else os.path.join(FACULTIES_DIR, key)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.cache_file = self.path(CACHE_FILE)
+        self.snapshot_file = self.path(SNAPSHOT_FILE)
+        self.page_cache_file = self.path(PAGE_CACHE_FILE)
+        self.hierarchy_file = self.path(HIERARCHY_FILE)
+        self.scrape_log_file = self.path(SCRAPE_LOG_FILE)
+        self.record_dir = SCRAPE_RECORD_DIR if default or not SCRAPE_RECORD_DIR else os.path.join(SCRAPE_RECORD_DIR, key)
+        self.db_file = SCHEDULE_DB if default or not SCHEDULE_DB else self.path(os.path.basename(SCHEDULE_DB))
+        self.db = ScheduleDB(self.db_file, history=SCHEDULE_DB_HISTORY) if self.db_file else None
+        self.refresh_lock = FileLock(self.path(REFRESH_LOCK_FILE))
+        # Progress of the latest refresh job, whichever worker runs it
+        self.refresh_job_file = self.path(REFRESH_JOB_FILE)
+        self.snapshot = ScheduleSnapshot(Schedule())
+        # stat signature of the snapshot file this worker is serving, to notice rewrites by other workers
+        self.snapshot_signature = None
+        self.reload_lock = threading.Lock()
+        self.last_snapshot_check = 0.0
+        # version -> Schedule of the last DELTA_HISTORY snapshots this worker published
+        self.history = OrderedDict()
+        # Last successful crawl and its debug payload, the running job and the last finished one
+        self.scraper = None
+        self.debug = {}
+        self.active_job = None
+        self.last_refresh = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name) if self.directory else name
+
+    def publish(self, schedule, version):
+        """Build a snapshot for a schedule and make it the one being served"""
+        snapshot = ScheduleSnapshot(schedule, version)
+        self.snapshot = snapshot
+        self.history[version] = schedule
+        while len(self.history) > max(1, DELTA_HISTORY):
+            self.history.popitem(last=False)
+        for encoding, size in snapshot.payload.sizes().items():
+            SNAPSHOT_BYTES.labels(self.key, encoding).set(size)
+        if os.path.exists(self.snapshot_file):
+            SNAPSHOT_BYTES.labels(self.key, 'snapshot_file').set(os.path.getsize(self.snapshot_file))
+        # Off the request path, like the rest of the snapshot: the page asks for a day shard first
+        for day in DAYS:
+            snapshot.day_shard(day)
+        if self.default and INDEX_INLINE in ('day', 'free'):
+            # Built with the snapshot, not by the first visitor
+            snapshot.index_page(current_day(), INDEX_INLINE)
+        SNAPSHOT_CLASSES.labels(self.key).set(schedule.entry_count())
+        SNAPSHOT_VERSION.labels(self.key).set(version)
+        SNAPSHOT_MEMORY.labels(self.key).set(snapshot.memory_bytes())
+        report_worker_state()
+        return snapshot
+
+    def next_snapshot_version(self):
+        """Version for a freshly crawled snapshot, above anything any worker has published"""
+        return max(self.snapshot.version, read_snapshot_version(self.snapshot_file)) + 1
+
+    def snapshot_is_current(self):
+        """The binary snapshot exists and is not older than the JSON export"""
+        if not os.path.exists(self.snapshot_file):
+            return False
+        return (not os.path.exists(self.cache_file)
+                or os.path.getmtime(self.snapshot_file) >= os.path.getmtime(self.cache_file))
+
+    def load_cache(self):
+        if self.snapshot_is_current():
+            signature = file_signature(self.snapshot_file)
+            try:
+                schedule, version = read_snapshot(self.snapshot_file)
+                print(f'Loaded {self.key} schedule snapshot.')
+                self.snapshot_signature = signature
+                self.publish(schedule, version)
+                return
+            except (OSError, ValueError) as e:
+                print(f'Could not read {self.key} schedule snapshot ({e}), falling back to JSON.')
+        schedule, version = Schedule(), 0
+        if os.path.exists(self.cache_file):
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                # Caches written before the ingest stage existed hold raw, uncoalesced entries
+                schedule, _ = coalesce_schedule(Schedule.from_json(data.get('schedule', {}), data.get('halls', [])))
+                version = data.get('version', 0)
+                del data
+                print(f'Loaded {self.key} schedule cache.')
+            # Convert once so the next worker start takes the fast path
+            try:
+                write_snapshot(self.snapshot_file, schedule, version)
+                self.snapshot_signature = file_signature(self.snapshot_file)
+            except OSError as e:
+                print(f'Could not write {self.key} schedule snapshot: {e}')
+        else:
+            print(f'No {self.key} cache file found.')
+        self.publish(schedule, version)
+
+    def reload_if_changed(self):
+        """Pick up a snapshot written by another worker; cheap (one stat) when nothing changed.
+
+        The new snapshot (index, analytics, encoded bodies) is built in a
+        background thread, so no request waits for it: they all keep getting
+        the current snapshot until publish() swaps it.
+        """
+        now = time.monotonic()
+        if now - self.last_snapshot_check < SNAPSHOT_CHECK_INTERVAL:
+            return
+        self.last_snapshot_check = now
+        signature = file_signature(self.snapshot_file)
+        if signature is None or signature == self.snapshot_signature:
+            return
+        # One reload at a time
+        if not self.reload_lock.acquire(blocking=False):
+            return
+        threading.Thread(target=self.reload, args=(signature,), name=f'reload-{self.key}', daemon=True).start()
+
+    def reload(self, signature):
+        """Load the snapshot file (seen with `signature`) and publish it if it is newer"""
+        try:
+            schedule, version = read_snapshot(self.snapshot_file)
+            self.snapshot_signature = signature
+            if version > self.snapshot.version:
+                self.publish(schedule, version)
+                print(f'Picked up {self.key} schedule snapshot version {version}.')
+        except (OSError, ValueError) as e:
+            print(f'Could not reload {self.key} schedule snapshot: {e}')
+        finally:
+            self.reload_lock.release()
+
+    def load_page_cache(self):
+        if os.path.exists(self.page_cache_file):
+            try:
+                with open(self.page_cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('format') == PAGE_CACHE_FORMAT:
+                    return data.get('pages', {})
+                print(f'{self.key} page cache is in an older format, all pages will be re-parsed.')
+            except (OSError, ValueError) as e:
+                print(f'Could not read {self.key} page cache ({e}), all pages will be re-parsed.')
+        return {}
+
+    def save_page_cache(self, pages):
+        tmp_path = f"{self.page_cache_file}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': PAGE_CACHE_FORMAT, 'pages': pages}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.page_cache_file)
+
+    def load_hierarchy(self):
+        """The cached hierarchy tree, or None if there is none or it is older than HIERARCHY_TTL"""
+        if HIERARCHY_TTL <= 0 or not os.path.exists(self.hierarchy_file):
+            return None
+        try:
+            with open(self.hierarchy_file, 'r', encoding='utf-8') as f:
+                hierarchy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Could not read {self.key} hierarchy cache ({e}), it will be rediscovered.')
+            return None
+        if not hierarchy.get('departments') or time.time() - hierarchy.get('fetched', 0) >= HIERARCHY_TTL:
+            return None
+        return hierarchy
+
+    def save_hierarchy(self, hierarchy):
+        tmp_path = f"{self.hierarchy_file}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(hierarchy, f, ensure_ascii=False)
+        os.replace(tmp_path, self.hierarchy_file)
+
+    def store_snapshot(self, snapshot):
+        """Add a snapshot to the SQLite history (one transaction), if that backend is enabled"""
+        if self.db is None or not snapshot.halls:
+            return
+        try:
+            if self.db.write(snapshot.schedule, snapshot.version, snapshot.created):
+                print(f'Stored {self.key} schedule version {snapshot.version} in {self.db_file}.')
+        except sqlite3.Error as e:
+            print(f'Could not store {self.key} schedule in {self.db_file}: {e}')
+
+    def schedule_version(self, version):
+        """The schedule published as `version`, if this worker or the SQLite history still has it"""
+        schedule = self.history.get(version)
+        if schedule is None and self.db is not None:
+            try:
+                schedule = self.db.load(version)
+            except sqlite3.Error as e:
+                print(f'Could not load {self.key} schedule version {version}: {e}')
+        return schedule
+
+    def query_index(self, snapshot):
+        """Free-hall queries for a snapshot: its in-memory index, or indexed SQLite
+        queries with QUERY_BACKEND=sqlite once the version is in the database"""
+        if QUERY_BACKEND == 'sqlite' and self.db is not None:
+            try:
+                index = self.db.index(snapshot.version)
+            except sqlite3.Error as e:
+                print(f'SQLite query backend unavailable: {e}')
+                index = None
+            if index is not None:
+                return index
+        return snapshot.index
+
+    def save_cache(self, snapshot):
+        # JSON export kept for compatibility with existing consumers of the cache file
+        with open(self.cache_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': snapshot.version,
+                'schedule': snapshot.schedule.to_json(),
+                'halls': snapshot.halls
+            }, f, ensure_ascii=False, indent=2)
+        # Stored before the snapshot file, so workers that pick the file up find it in the database
+        self.store_snapshot(snapshot)
+        # Written last so it is never older than the JSON and load_cache prefers it
+        SNAPSHOT_BYTES.labels(self.key, 'snapshot_file').set(
+            write_snapshot(self.snapshot_file, snapshot.schedule, snapshot.version))
+        self.snapshot_signature = file_signature(self.snapshot_file)
+        if self.scraper is not None:
+            self.save_page_cache(self.scraper.pages)
+            if self.scraper.hierarchy:
+                self.save_hierarchy(self.scraper.hierarchy)
+        with open(self.scrape_log_file, 'w', encoding='utf-8') as f:
+            json.dump(self.debug, f, ensure_ascii=False)
+        print(f'Saved {self.key} schedule cache.')
+
+    def shared_job(self):
+        """Progress of the latest refresh job of this faculty as published by its worker, or None"""
+        state = read_state(self.refresh_job_file)
+        if state is not None and state.pop('alive') is False and state['status'] == 'running':
+            state.update(status='failed', error='The worker running this refresh exited')
+        return state
+
+    def status(self):
+        """What /api/faculties reports: the served snapshot, its memory, and the last refresh"""
+        snapshot = self.snapshot
+        return {
+            'faculty': self.key,
+            'default': self.default,
+            'snapshot_version': snapshot.version,
+            'snapshot_created': snapshot.created,
+            'halls': len(snapshot.halls),
+            'classes': snapshot.schedule.entry_count(),
+            'memory_bytes': snapshot.memory_bytes(),
+            'refreshing': self.refresh_lock.held,
+            'last_refresh': self.last_refresh,
+        }
+
+
+# Filled by load_faculties()
+faculties = {}
+default_faculty = None
+scheduler_leader = FileLock(SCHEDULER_LOCK_FILE)
+# Shared by the crawls of all faculties, which may run at the same time
+upstream_budget = UpstreamBudget(SCRAPE_GLOBAL_CONCURRENCY, SCRAPE_PER_HOST)
+
+def report_worker_state():
+    snapshot = default_faculty.snapshot
+    try:
+        write_worker_state(WORKER_STATE_DIR, {
+            'snapshot_version': snapshot.version,
+            'snapshot_created': snapshot.created,
+            'halls': len(snapshot.halls),
+            'faculties': {key: faculty.snapshot.version for key, faculty in faculties.items()},
+            'scheduler_leader': scheduler_leader.held,
+        })
+    except OSError as e:
+        print(f'Could not write worker state: {e}')
+    dump_metrics(force=True)
+
+_metrics_dumped = 0.0
+
+def dump_metrics(force=False):
+    """Publish this worker's metrics for /metrics in the others, throttled unless `force`"""
+    global _metrics_dumped
+    now = time.monotonic()
+    if not force and now - _metrics_dumped < METRICS_DUMP_INTERVAL:
+        return
+    _metrics_dumped = now
+    try:
+        write_worker_state(METRICS_DIR, {'metrics': REGISTRY.dump()})
+    except OSError as e:
+        print(f'Could not write worker metrics: {e}')
+
+def scrape_debug(scraper):
+    """Debug payload of a crawl: the bounded log buffer and one summary per page"""
+    return {'log': list(scraper.debug_info), 'pages': scraper.page_log}
+
+def load_faculties():
+    """Set up the faculties of FACULTIES and load the snapshot each of them serves"""
+    global default_faculty
+    for key, url in parse_faculties(FACULTIES):
+        faculties[key] = Faculty(key, url, default=not faculties)
+    default_faculty = next(iter(faculties.values()))
+    for faculty in faculties.values():
+        faculty.load_cache()
+        # Seeds the history with whatever this worker starts from (a no-op if that version is stored)
+        faculty.store_snapshot(faculty.snapshot)
+
+
+def completeness_problem(scraper, current):
+    """Why a finished crawl must not replace the `current` snapshot, or None"""
+    stats = scraper.stats
+    if stats['pages'] and stats['failed_pages'] > stats['pages'] * SCRAPE_MAX_FAILED_RATIO:
+        return f"{stats['failed_pages']} of {stats['pages']} timetable pages failed"
+    schedule = scraper.schedule_data
+    classes, served_classes = schedule.entry_count(), current.schedule.entry_count()
+    if classes < served_classes * SNAPSHOT_MIN_RATIO:
+        return f"only {classes} classes, version {current.version} has {served_classes}"
+    if len(schedule.halls) < len(current.halls) * SNAPSHOT_MIN_RATIO:
+        return f"only {len(schedule.halls)} halls, version {current.version} has {len(current.halls)}"
+    return None
+
+
+class RefreshJob:
+    """A crawl of one faculty running in a background thread, observable while it runs.
+
+    The new snapshot is published only once the crawl has finished
+    successfully and passed the completeness check (unless `force`);
+    until then readers keep getting the previous one. Ends as
+    'succeeded', 'failed' (including aborted crawls) or 'rejected'.
+    A forced crawl also rediscovers the hierarchy instead of using the cache.
+    """
+
+    def __init__(self, faculty, trigger, force=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.faculty = faculty
+        self.trigger = trigger
+        self.force = force
+        self.status = 'running'
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.reported = threading.Event()
+        recorder = Recorder(faculty.record_dir, faculty.base_url) if faculty.record_dir else None
+        self.scraper = ScheduleScraper(faculty.base_url, previous_pages=faculty.load_page_cache(), recorder=recorder,
+                                       hierarchy=None if force else faculty.load_hierarchy(), budget=upstream_budget)
+
+    def publish_progress(self):
+        """Write progress() to the faculty's REFRESH_JOB_FILE for the other workers"""
+        try:
+            write_state(self.faculty.refresh_job_file, self.progress())
+        except (OSError, TypeError, ValueError) as e:
+            print(f'Could not write progress of refresh job {self.id}: {e}')
+
+    def report_progress(self):
+        while not self.reported.wait(REFRESH_EVENT_INTERVAL):
+            self.publish_progress()
+            dump_metrics()
+
+    def run(self):
+        faculty = self.faculty
+        reporter = threading.Thread(target=self.report_progress, name=f'progress-{self.id}', daemon=True)
+        reporter.start()
+        try:
+            success = self.scraper.scrape_all()
+            problem = None if not success or self.force else completeness_problem(self.scraper, faculty.snapshot)
+            if not success:
+                self.error = self.scraper.aborted or 'Crawl failed'
+                self.status = 'failed'
+            elif problem:
+                self.error = f"Kept version {faculty.snapshot.version}: {problem}"
+                self.status = 'rejected'
+            else:
+                snapshot = faculty.publish(self.scraper.schedule_data, faculty.next_snapshot_version())
+                faculty.scraper = self.scraper
+                faculty.debug = scrape_debug(self.scraper)
+                faculty.save_cache(snapshot)
+                self.status = 'succeeded'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            if self.scraper.recorder is not None:
+                try:
+                    self.scraper.recorder.save()
+                except OSError as e:
+                    print(f'Could not save recorded responses: {e}')
+            self.finished = time.time()
+            REFRESH_SECONDS.labels(faculty.key, self.status).observe(self.finished - self.started)
+            stats = self.scraper.stats
+            faculty.last_refresh = {
+                'job_id': self.id,
+                'trigger': self.trigger,
+                'status': self.status,
+                'error': self.error,
+                'started': self.started,
+                'seconds': round(self.finished - self.started, 3),
+                'pages': stats['pages'],
+                'requests': stats['requests'],
+                'phases': dict(stats['phases']),
+            }
+            self.reported.set()
+            # Its last write must not land after the final state
+            reporter.join()
+            self.publish_progress()
+            # Only now: a refresh started by another worker overwrites the progress file
+            faculty.refresh_lock.release()
+            dump_metrics(force=True)
+            print(f"[REFRESH {self.id}] {self.trigger} refresh of {faculty.key} {self.status} "
+                  f"after {self.finished - self.started:.1f}s." + (f" {self.error}" if self.error else ''))
+
+    def progress(self):
+        stats = self.scraper.stats
+        state = {
+            'job_id': self.id,
+            'faculty': self.faculty.key,
+            'trigger': self.trigger,
+            'status': self.status,
+            'pages_done': stats['pages_done'],
+            'pages_total': stats['pages'],
+            'errors': stats['errors'],
+            'elapsed': round((self.finished or time.time()) - self.started, 1),
+        }
+        if self.status != 'running':
+            state['stats'] = dict(stats)
+            state['error'] = self.error
+        return state
+
+
+refresh_jobs = {}
+refresh_jobs_lock = threading.Lock()
+MAX_REFRESH_JOBS = 20
+
+def start_refresh(faculty, trigger, force=False):
+    """Start a background refresh of one faculty unless one is running; returns (job, started).
+
+    job is None when another worker process is crawling it (see Faculty.shared_job). `force` skips
+    the completeness check and the hierarchy cache. Refreshes of different
+    faculties run side by side within the shared upstream budget.
+    """
+    with refresh_jobs_lock:
+        # The job holds the lock until its final state is written, even once its status is set
+        if faculty.active_job is not None and faculty.refresh_lock.held:
+            return faculty.active_job, False
+        if not faculty.refresh_lock.try_acquire():
+            return None, False
+        try:
+            job = RefreshJob(faculty, trigger, force)
+        except Exception:
+            # e.g. an unwritable SCRAPE_RECORD_DIR; a held lock would refuse every later refresh
+            faculty.refresh_lock.release()
+            raise
+        refresh_jobs[job.id] = job
+        # Forget the oldest finished jobs
+        for old_id in list(refresh_jobs)[:-MAX_REFRESH_JOBS]:
+            del refresh_jobs[old_id]
+        faculty.active_job = job
+        # Before the lock is visible as held for long, so other workers can name the job holding it
+        job.publish_progress()
+    threading.Thread(target=job.run, name=f'refresh-{faculty.key}-{job.id}', daemon=True).start()
+    return job, True
 
 ADMIN_USER = os.environ.get('ADMIN_USER', 'admin')
 ADMIN_PASS = os.environ.get('ADMIN_PASS', 'admin123')
@@ -538,66 +1891,344 @@ def requires_auth(f):
             return authenticate()
         return f(*args, **kwargs)
     return decorated
-try:
-    from apscheduler.schedulers.background import BackgroundScheduler
-    import pytz
-    def scheduled_refresh():
-        global faculty_scraper, faculty_schedule, faculty_halls, faculty_debug
-        print("[SCHEDULED] Refreshing faculty schedule cache...")
-        faculty_scraper = ScheduleScraper(BASE_URL)
-        success = faculty_scraper.scrape_all()
-        if success:
-            faculty_schedule = dict(faculty_scraper.schedule_data)
-            faculty_halls = list(faculty_scraper.halls)
-            faculty_debug = faculty_scraper.debug_info
-            save_cache()
-            print("[SCHEDULED] Faculty schedule cache refreshed.")
+
+def faculty_route(rule, **options):
+    """Register an API view as /api<rule> for the default faculty and as
+    /api/<faculty><rule> for any faculty; the view gets the Faculty first"""
+    def decorator(view):
+        @wraps(view)
+        def scoped(faculty=None, **kwargs):
+            source = default_faculty if faculty is None else faculties.get(faculty)
+            if source is None:
+                return jsonify({'error': f"Unknown faculty, expected one of: {', '.join(faculties)}"}), 404
+            return view(source, **kwargs)
+        app.route('/api' + rule, **options)(scoped)
+        app.route('/api/<faculty>' + rule, **options)(scoped)
+        return scoped
+    return decorator
+def scheduled_refresh():
+    # Every worker runs a scheduler, but only the lock holder crawls; if it dies the
+    # lock is released and another worker takes over at the next run
+    if not scheduler_leader.try_acquire():
+        return
+    report_worker_state()
+    # All faculties at once; the shared upstream budget bounds the load on the timetable servers
+    for faculty in faculties.values():
+        job, started = start_refresh(faculty, 'scheduled')
+        if job is None:
+            state = faculty.shared_job() or {}
+            print(f"[SCHEDULED] Another worker is already refreshing {faculty.key} "
+                  f"(job {state.get('job_id')}, pid {state.get('pid')}), skipping.")
+        elif started:
+            print(f"[SCHEDULED] Refreshing {faculty.key} schedule cache (job {job.id})...")
         else:
-            print("[SCHEDULED] Faculty schedule refresh failed.")
+            print(f"[SCHEDULED] Refresh job {job.id} of {faculty.key} is still running, skipping.")
+
+def start_scheduler():
+    """Run scheduled_refresh every midnight; None if APScheduler or pytz is not installed"""
+    try:
+        from apscheduler.schedulers.background import BackgroundScheduler
+        import pytz
+    except ImportError:
+        print("APScheduler or pytz not installed. Scheduled scraping is disabled.")
+        return None
     scheduler = BackgroundScheduler(timezone=pytz.timezone('Europe/Berlin'))
     scheduler.add_job(scheduled_refresh, 'cron', hour=0, minute=0)
     scheduler.start()
-except ImportError:
-    print("APScheduler or pytz not installed. Scheduled scraping is disabled.")
+    return scheduler
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def pick_up_new_snapshot():
+    for faculty in faculties.values():
+        faculty.reload_if_changed()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    # Streamed responses (SSE) have no length
+    if response.content_length is not None:
+        HTTP_RESPONSE_BYTES.labels(endpoint).observe(response.content_length)
+    dump_metrics()
+    return response
+
+
+@app.route('/api/health')
+def health():
+    """Snapshot version served by this worker and by every other live worker"""
+    snapshot = default_faculty.snapshot
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'snapshot_version': snapshot.version,
+        'snapshot_created': snapshot.created,
+        'snapshot_on_disk': read_snapshot_version(default_faculty.snapshot_file),
+        'scheduler_leader': scheduler_leader.held,
+        'refreshing': default_faculty.refresh_lock.held,
+        'faculties': {key: faculty.snapshot.version for key, faculty in faculties.items()},
+        'workers': read_worker_states(WORKER_STATE_DIR)
+    })
+
+
+@app.route('/api/faculties')
+def list_faculties():
+    """Every faculty served here: snapshot, approximate memory and the timing of its last refresh"""
+    return jsonify({
+        'default': default_faculty.key,
+        'faculties': [faculty.status() for faculty in faculties.values()]
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of all live workers: this one's current values and the others' last dumps"""
+    others = [(state['pid'], state['metrics']) for state in read_worker_states(METRICS_DIR)
+              if state['pid'] != os.getpid() and isinstance(state.get('metrics'), dict)]
+    return Response(REGISTRY.render(others), content_type=CONTENT_TYPE)
 
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    # Prebuilt and precompressed: once at startup, or per snapshot and day with INDEX_INLINE
+    if INDEX_INLINE in ('day', 'free'):
+        return serve(default_faculty.snapshot.index_page(current_day(), INDEX_INLINE), max_age=INDEX_MAX_AGE)
+    return serve(STATIC_INDEX_PAGE, max_age=INDEX_MAX_AGE)
 
 
-# Admin-only: refresh schedule and update cache (protected by HTTP Basic Auth)
-@app.route('/api/refresh-schedule', methods=['POST'])
+# Admin-only: start a background refresh (protected by HTTP Basic Auth);
+# ?force=1 rediscovers the hierarchy and publishes the result even if it fails the completeness check
+@faculty_route('/refresh-schedule', methods=['POST'])
 @requires_auth
-def refresh_schedule():
-    global faculty_scraper, faculty_schedule, faculty_halls, faculty_debug
-    faculty_scraper = ScheduleScraper(BASE_URL)
-    success = faculty_scraper.scrape_all()
-    faculty_schedule = dict(faculty_scraper.schedule_data)
-    faculty_halls = list(faculty_scraper.halls)
-    faculty_debug = faculty_scraper.debug_info
-    save_cache()
+def refresh_schedule(faculty):
+    job, started = start_refresh(faculty, 'admin', force=request.args.get('force') == '1')
+    if job is None:
+        # Crawling in another worker: point at its job, which every worker can report on
+        body = {'error': 'A refresh is already running in another worker'}
+        state = faculty.shared_job()
+        if state is not None and state['status'] == 'running':
+            body.update({
+                'job_id': state['job_id'],
+                'progress': state,
+                'status_url': f"/api/refresh-jobs/{state['job_id']}",
+                'events_url': f"/api/refresh-jobs/{state['job_id']}/events"
+            })
+        return jsonify(body), 409
     return jsonify({
-        'success': success,
-        'schedule': faculty_schedule,
-        'halls': faculty_halls,
-        'debug': faculty_debug
+        'job_id': job.id,
+        'started': started,
+        'status_url': f'/api/refresh-jobs/{job.id}',
+        'events_url': f'/api/refresh-jobs/{job.id}/events'
+    }), 202
+
+def refresh_job_state(job_id):
+    """Progress of a refresh job: live if this worker runs it, else from its faculty's
+    REFRESH_JOB_FILE (the latest job of each faculty), or None if unknown"""
+    job = refresh_jobs.get(job_id)
+    if job is not None:
+        return job.progress()
+    for faculty in faculties.values():
+        state = faculty.shared_job()
+        if state is not None and state.get('job_id') == job_id:
+            return state
+    return None
+
+@app.route('/api/refresh-jobs/<job_id>')
+@requires_auth
+def refresh_job_status(job_id):
+    """Progress of a refresh job, from any worker; ?debug=1 adds the crawl log and
+    per-page summaries when asked of the worker running it"""
+    state = refresh_job_state(job_id)
+    if state is None:
+        return jsonify({'error': 'Unknown refresh job'}), 404
+    job = refresh_jobs.get(job_id)
+    if job is not None and request.args.get('debug') == '1':
+        state['debug'] = scrape_debug(job.scraper)
+    return jsonify(state)
+
+@app.route('/api/refresh-jobs/<job_id>/events')
+@requires_auth
+def refresh_job_events(job_id):
+    """Server-Sent Events: a `progress` event every REFRESH_EVENT_INTERVAL, then `done`.
+
+    Each stream ends after REFRESH_EVENTS_MAX_SECONDS without `done`; EventSource
+    then reconnects by itself, possibly to another worker. Clients close it on `done`.
+    """
+    if refresh_job_state(job_id) is None:
+        return jsonify({'error': 'Unknown refresh job'}), 404
+    def stream():
+        deadline = time.monotonic() + REFRESH_EVENTS_MAX_SECONDS
+        yield f"retry: {int(REFRESH_EVENT_INTERVAL * 1000)}\n\n"
+        while True:
+            state = refresh_job_state(job_id)
+            if state is None:
+                return
+            finished = state['status'] != 'running'
+            yield f"event: {'done' if finished else 'progress'}\ndata: {json.dumps(state)}\n\n"
+            if finished or time.monotonic() + REFRESH_EVENT_INTERVAL > deadline:
+                return
+            time.sleep(REFRESH_EVENT_INTERVAL)
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@faculty_route('/schedule')
+def get_schedule(faculty):
+    """The whole schedule, or with ?since=<version> only what changed since that version"""
+    # Always serve from cache, pre-serialized and pre-compressed at refresh time
+    snapshot = faculty.snapshot
+    since = request.args.get('since', type=int)
+    if since is not None:
+        base = snapshot.schedule if since == snapshot.version else faculty.schedule_version(since)
+        if base is not None:
+            return serve(snapshot.delta(since, base), max_age=SCHEDULE_MAX_AGE)
+    # Unknown or too old a version: the client starts over from the full schedule
+    return serve(snapshot.payload, max_age=SCHEDULE_MAX_AGE)
+
+@faculty_route('/schedule/<day>')
+def get_schedule_day(faculty, day):
+    """One day of the schedule, e.g. /api/schedule/E Hënë; the page loads the selected day first"""
+    if day not in DAYS:
+        return jsonify({'error': f"Unknown day, expected one of: {', '.join(DAYS)}"}), 404
+    return serve(faculty.snapshot.day_shard(day), max_age=SCHEDULE_MAX_AGE)
+
+@faculty_route('/halls/<path:hall>')
+def get_hall_schedule(faculty, hall):
+    """One hall's classes on every day, e.g. /api/halls/Salla (304C)"""
+    snapshot = faculty.snapshot
+    if hall not in snapshot.halls:
+        return jsonify({'error': f"Unknown hall: {hall}"}), 404
+    return serve(snapshot.hall_shard(hall), max_age=SCHEDULE_MAX_AGE)
+
+@faculty_route('/analytics/<view>')
+def get_analytics(faculty, view):
+    """Hall utilization, computed at refresh time: /api/analytics/halls (least used first),
+    /days, /slots (peak and quiet) or /free-halls (free halls per slot over each day)"""
+    snapshot = faculty.snapshot
+    if snapshot.analytics is None:
+        return jsonify({'error': 'Analytics are disabled (set ANALYTICS=1 and install numpy)'}), 404
+    if view not in snapshot.analytics.views:
+        return jsonify({'error': f"Unknown view, expected one of: {', '.join(snapshot.analytics.views)}"}), 404
+    return serve(snapshot.analytics_view(view), max_age=SCHEDULE_MAX_AGE)
+
+@faculty_route('/snapshots')
+def list_snapshots(faculty):
+    """Schedule versions kept in the SQLite history, newest first"""
+    if faculty.db is None:
+        return jsonify({'error': 'Snapshot history is disabled (set SCHEDULE_DB)'}), 404
+    return jsonify({
+        'current': faculty.snapshot.version,
+        'snapshots': faculty.db.snapshots()
+    })
+
+@faculty_route('/snapshots/<int:version>')
+def get_snapshot(faculty, version):
+    """One stored version of the schedule, in the /api/schedule shape"""
+    if faculty.db is None:
+        return jsonify({'error': 'Snapshot history is disabled (set SCHEDULE_DB)'}), 404
+    schedule = faculty.db.load(version)
+    if schedule is None:
+        return jsonify({'error': f"Unknown snapshot version: {version}"}), 404
+    return jsonify({
+        'version': version,
+        'schedule': schedule.to_json(),
+        'halls': schedule.halls
+    })
+
+@faculty_route('/free-halls')
+def get_free_halls(faculty):
+    """Free halls for one day/time, e.g. /api/free-halls?day=E Hënë&time=10:15"""
+    day = request.args.get('day', '')
+    time_arg = request.args.get('time', '')
+    if day not in DAYS:
+        return jsonify({'error': f"Unknown day, expected one of: {', '.join(DAYS)}"}), 400
+    index = faculty.query_index(faculty.snapshot)
+    try:
+        free = index.free_halls(day, time_arg)
+    except ValueError:
+        return jsonify({'error': 'Expected time as HH:MM'}), 400
+    return jsonify({
+        'day': day,
+        'time': time_arg,
+        'total': len(index.halls),
+        'free': free
     })
 
-@app.route('/api/schedule')
-def get_schedule():
-    global faculty_schedule, faculty_halls, faculty_debug
-    # Always serve from cache
+@faculty_route('/free-window')
+def get_free_window(faculty):
+    """Halls free for a whole window, e.g. /api/free-window?day=E Hënë&from=10:00&until=13:00"""
+    day = request.args.get('day', '')
+    start = request.args.get('from', '')
+    end = request.args.get('until', '')
+    if day not in DAYS:
+        return jsonify({'error': f"Unknown day, expected one of: {', '.join(DAYS)}"}), 400
+    index = faculty.query_index(faculty.snapshot)
+    try:
+        free = index.free_between(day, start, end)
+    except ValueError:
+        return jsonify({'error': 'Expected from/until as HH:MM with until after from'}), 400
     return jsonify({
-        'schedule': faculty_schedule,
-        'halls': faculty_halls
+        'day': day,
+        'from': start,
+        'until': end,
+        'total': len(index.halls),
+        'free': free
     })
 
+@faculty_route('/hall-status')
+def get_hall_status(faculty):
+    """When a hall is next free and how long it stays free.
+
+    /api/hall-status?day=E Hënë&time=10:15[&hall=Salla (301A)]; without
+    `hall` every hall is reported.
+    """
+    day = request.args.get('day', '')
+    time_arg = request.args.get('time', '')
+    hall = request.args.get('hall')
+    if day not in DAYS:
+        return jsonify({'error': f"Unknown day, expected one of: {', '.join(DAYS)}"}), 400
+    index = faculty.query_index(faculty.snapshot)
+    if hall is not None and hall not in index.halls:
+        return jsonify({'error': f"Unknown hall: {hall}"}), 404
+    halls = [hall] if hall is not None else index.halls
+    try:
+        statuses = [index.hall_status(day, h, time_arg) for h in halls]
+    except ValueError:
+        return jsonify({'error': 'Expected time as HH:MM'}), 400
+    return jsonify({
+        'day': day,
+        'time': time_arg,
+        'halls': statuses
+    })
+
+_app_lock = threading.Lock()
+
+def create_app(scheduler=True):
+    """Load the faculties and start this process's background work, once; returns the app.
+
+    gunicorn calls it in every worker. The scrape log thread and, with
+    `scheduler`, the nightly refresh start here rather than at import.
+    """
+    with _app_lock:
+        if not faculties:
+            start_scrape_log()
+            load_faculties()
+            if scheduler:
+                start_scheduler()
+    return app
+
 if __name__ == '__main__':
+    create_app()
     print("=" * 60)
     print("Empty Halls Finder - Student Mode")
     print("=" * 60)
-    print(f"\nBase URL: {BASE_URL}")
+    for faculty in faculties.values():
+        print(f"\nBase URL of {faculty.key}: {faculty.base_url}")
     print("\nIMPORTANT: Make sure BASE_URL is correct!")
     print("\nStarting server on http://localhost:5000")
     print("=" * 60)
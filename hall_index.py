@@ -0,0 +1,154 @@
+"""
+Precomputed hall occupancy index used to answer free-hall queries
+"""
+
+import sys
+from bisect import bisect_left, bisect_right
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def time_to_minutes(value):
+    """Convert 'HH:MM' to minutes since midnight (raises ValueError if malformed)"""
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time: {value!r}")
+    return hours * 60 + minutes
+
+
+def minutes_to_time(value):
+    """Convert minutes since midnight back to 'HH:MM'"""
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def _minutes(value):
+    return time_to_minutes(value) if isinstance(value, str) else value
+
+
+def merge_intervals(classes):
+    """Sorted, non-overlapping (starts, ends) busy arrays for one hall's ClassEntry list.
+
+    Overlapping and back-to-back classes are merged, so the end of the interval
+    covering a minute is also the next minute the hall is free.
+    """
+    return merge_spans((cls.start, cls.end) for cls in classes)
+
+
+def merge_spans(spans):
+    """merge_intervals() for plain (start, end) minute pairs"""
+    starts, ends = [], []
+    for start, end in sorted(spans):
+        if end <= start:
+            continue
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class HallIndex:
+    """Per-day, per-hall occupancy bitmaps and sorted busy intervals.
+
+    Built once per refresh from a schedule_model.Schedule. Bit `m` of a
+    hall's bitmap is set when a class covers minute `m` (start inclusive,
+    end exclusive, like the front end), so "which halls are free at 10:15"
+    is one bit test per hall. The merged busy intervals answer window and
+    next-free/next-busy questions with a binary search per hall.
+    """
+
+    def __init__(self, schedule):
+        self.halls = list(schedule.halls)
+        self._positions = {hall: i for i, hall in enumerate(self.halls)}
+        self.days = {}
+        self.intervals = {}
+        for day, day_halls in schedule.days.items():
+            intervals = [merge_intervals(day_halls.get(hall, ())) for hall in self.halls]
+            self.intervals[day] = intervals
+            self.days[day] = [self._bitmap(starts, ends) for starts, ends in intervals]
+
+    def memory_bytes(self):
+        """Approximate size of the bitmaps and interval lists (hall names belong to the schedule)"""
+        total = sys.getsizeof(self.halls) + sys.getsizeof(self._positions)
+        for bitmaps in self.days.values():
+            total += sys.getsizeof(bitmaps) + sum(map(sys.getsizeof, bitmaps))
+        for intervals in self.intervals.values():
+            total += sys.getsizeof(intervals)
+            for starts, ends in intervals:
+                total += sys.getsizeof(starts) + sys.getsizeof(ends) + sum(map(sys.getsizeof, starts + ends))
+        return total
+
+    @staticmethod
+    def _bitmap(starts, ends):
+        bits = 0
+        for start, end in zip(starts, ends):
+            bits |= ((1 << (end - start)) - 1) << start
+        return bits
+
+    def _hall_intervals(self, day, hall):
+        intervals = self.intervals.get(day)
+        if intervals is None or hall not in self._positions:
+            return [], []
+        return intervals[self._positions[hall]]
+
+    def free_halls(self, day, time):
+        """Halls with no class on `day` at `time` ('HH:MM' or minutes since midnight)"""
+        minute = _minutes(time)
+        bitmaps = self.days.get(day)
+        if bitmaps is None:
+            return list(self.halls)
+        return [hall for hall, bits in zip(self.halls, bitmaps) if not (bits >> minute) & 1]
+
+    def is_free_between(self, day, hall, start, end):
+        """Whether `hall` has no class overlapping [start, end) on `day`"""
+        start, end = _minutes(start), _minutes(end)
+        starts, ends = self._hall_intervals(day, hall)
+        # The only candidates are the last interval starting before `end`
+        i = bisect_left(starts, end) - 1
+        return i < 0 or ends[i] <= start
+
+    def free_between(self, day, start, end):
+        """Halls that stay free for the whole window [start, end) on `day`"""
+        start, end = _minutes(start), _minutes(end)
+        if end <= start:
+            raise ValueError("Window end must be after its start")
+        return [hall for hall in self.halls if self.is_free_between(day, hall, start, end)]
+
+    def next_free(self, day, hall, time):
+        """First minute at or after `time` when `hall` is free"""
+        minute = _minutes(time)
+        starts, ends = self._hall_intervals(day, hall)
+        i = bisect_right(starts, minute) - 1
+        if i >= 0 and ends[i] > minute:
+            return ends[i]
+        return minute
+
+    def next_busy(self, day, hall, time):
+        """First minute at or after `time` when `hall` is occupied, or None if it stays free"""
+        minute = _minutes(time)
+        starts, ends = self._hall_intervals(day, hall)
+        i = bisect_right(starts, minute) - 1
+        if i >= 0 and ends[i] > minute:
+            return minute
+        i += 1
+        return starts[i] if i < len(starts) else None
+
+    def hall_status(self, day, hall, time):
+        """Free/busy state of `hall` at `time` and how long it lasts.
+
+        `free_from` is when the hall is (next) free, `free_until` when that
+        free stretch ends (None = free for the rest of the day), and
+        `free_minutes` the length of the stretch.
+        """
+        minute = _minutes(time)
+        free_from = self.next_free(day, hall, minute)
+        free_until = self.next_busy(day, hall, free_from)
+        return {
+            'hall': hall,
+            'free': free_from == minute,
+            'free_from': minutes_to_time(free_from),
+            'free_until': minutes_to_time(free_until) if free_until is not None else None,
+            'free_minutes': (free_until if free_until is not None else MINUTES_PER_DAY) - free_from,
+        }
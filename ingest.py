@@ -0,0 +1,72 @@
+"""
+Ingest stage between scraping and publishing a snapshot
+
+The timetable lists every hour of a class as its own cell and every group
+page repeats shared lectures, so the raw per-hall class lists hold
+the same class many times. coalesce_schedule() collapses those copies:
+
+1. entries for the same time slot, subject and professor become one entry
+   whose `groups` lists every group attending;
+2. back-to-back (or overlapping) slots of the same class with the same
+   groups become one interval.
+
+Coalescing already coalesced data changes nothing.
+"""
+
+import json
+
+from schedule_model import Schedule
+
+
+def coalesce_hall(classes):
+    """Coalesce the ClassEntry list of one hall on one day.
+
+    Returns [subject, professor, groups, start, end] runs sorted by start time.
+    """
+    # 1. One entry per time slot and class, with all the groups attending it
+    slots = {}
+    for cls in classes:
+        groups = slots.setdefault((cls.start, cls.end, cls.subject, cls.professor), [])
+        for group in cls.groups:
+            if group not in groups:
+                groups.append(group)
+
+    # 2. Back-to-back slots of the same class and groups become one interval
+    runs = sorted(
+        (subject, professor, tuple(sorted(groups)), start, end)
+        for (start, end, subject, professor), groups in slots.items()
+    )
+    merged = []
+    for subject, professor, groups, start, end in runs:
+        last = merged[-1] if merged else None
+        if last and tuple(last[:3]) == (subject, professor, groups) and start <= last[4]:
+            last[4] = max(last[4], end)
+            continue
+        merged.append([subject, professor, groups, start, end])
+
+    merged.sort(key=lambda run: (run[3], run[4], run[0]))
+    return merged
+
+
+def _json_size(schedule):
+    return len(json.dumps(schedule.to_json(), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def coalesce_schedule(schedule):
+    """Coalesced copy of a schedule_model.Schedule; returns (schedule, report)"""
+    coalesced = Schedule(schedule.halls)
+    before = after = 0
+    for day, day_halls in schedule.days.items():
+        for hall, classes in day_halls.items():
+            merged = coalesce_hall(classes)
+            for subject, professor, groups, start, end in merged:
+                coalesced.add(day, hall, start, end, subject, professor, groups)
+            before += len(classes)
+            after += len(merged)
+    report = {
+        'entries_before': before,
+        'entries_after': after,
+        'json_bytes_before': _json_size(schedule),
+        'json_bytes_after': _json_size(coalesced),
+    }
+    return coalesced, report
@@ -0,0 +1,204 @@
+"""
+Minimal Prometheus metrics: counters, gauges and histograms
+
+Just enough of the Prometheus client to instrument the scraper and the
+request path without a new dependency. Metrics register themselves in
+REGISTRY and render() produces the text exposition format (0.0.4).
+Updates take one lock per metric. Every worker process has its own
+values, so a process publishes dump() for the others and render() merges
+their dumps into its own: counters and histograms are summed, gauges keep
+one series per process under a `pid` label. A worker that exits takes its
+counts with it, which Prometheus reads as a counter reset.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds, from a fast parse to a slow refresh
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Response and snapshot sizes
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def dump(self):
+        """Values of every metric as JSON-serializable data, for render() in another process"""
+        return {metric.name: metric.dump() for metric in self.metrics}
+
+    def render(self, others=()):
+        """Exposition of this process's metrics merged with `others`, (pid, dump()) of other processes"""
+        others = list(others)
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples([(pid, dump.get(metric.name, [])) for pid, dump in others]))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+    # Gauges are not additive, so every process keeps its own series
+    per_process = False
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if registry is not None:
+            registry.register(self)
+        if not self.labelnames:
+            # Unlabelled metrics are exposed (as zero) before their first update
+            self.labels()
+
+    def labels(self, *values):
+        """The child metric for one combination of label values"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} needs labels {self.labelnames}")
+        return self.labels()
+
+    def dump(self):
+        with self._lock:
+            children = list(self._children.items())
+        return [[list(values), child.dump()] for values, child in children]
+
+    def samples(self, others=()):
+        """Sample lines of this process's values merged with `others`, (pid, dump()) of other processes"""
+        labelnames = self.labelnames + ('pid',) if self.per_process else self.labelnames
+        # Merges and formats dumped data
+        blank = self._new_child()
+        merged = {}
+        for pid, dump in [(os.getpid(), self.dump())] + list(others):
+            for values, data in dump:
+                key = tuple(values) + (str(pid),) if self.per_process else tuple(values)
+                merged[key] = data if key not in merged else blank.merge(merged[key], data)
+        for values, data in sorted(merged.items()):
+            yield from blank.samples(self.name, labelnames, values, data)
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def dump(self):
+        return self.value
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    @staticmethod
+    def samples(name, labelnames, values, value):
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+    per_process = True
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def dump(self):
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+    @staticmethod
+    def merge(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+
+    def samples(self, name, labelnames, values, data):
+        counts, total = data
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labelnames, values, [('le', _format_value(float(bound)))])} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
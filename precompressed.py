@@ -0,0 +1,93 @@
+"""
+Pre-serialized, pre-compressed response bodies
+
+Bodies that only change on refresh are encoded once (identity, gzip and,
+if the brotli package is installed, br) and then served as bytes with a
+strong ETag, so a request costs a header lookup instead of a JSON dump.
+"""
+
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+# Brotli quality of bodies rebuilt per snapshot or on request; 11, the maximum, takes seconds on
+# a large schedule for a few percent, so only bodies built once per process (static=True) use it
+BROTLI_QUALITY = 5
+STATIC_BROTLI_QUALITY = 11
+
+
+class PrecompressedBody:
+    """One representation per content-coding plus a strong ETag for each"""
+
+    def __init__(self, raw, mimetype='application/json', static=False):
+        self.mimetype = mimetype
+        self.tag = hashlib.sha256(raw).hexdigest()[:32]
+        self.bodies = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli:
+            self.bodies['br'] = brotli.compress(raw, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def etag(self, encoding):
+        # Strong ETags must differ between byte-different representations
+        return f'"{self.tag}"' if encoding == 'identity' else f'"{self.tag}-{encoding}"'
+
+    def sizes(self):
+        return {encoding: len(body) for encoding, body in self.bodies.items()}
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _matches(if_none_match, body):
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        # Any representation of the same content is still fresh for the client
+        if candidate.strip('"').split('-')[0] == body.tag:
+            return True
+    return False
+
+
+def serve(body, max_age=60):
+    """Flask response for `body`, honouring If-None-Match and Accept-Encoding"""
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = next((name for name in ENCODINGS if name in accepted), 'identity')
+    headers = {
+        'ETag': body.etag(encoding),
+        'Cache-Control': f'public, max-age={max_age}',
+        'Vary': 'Accept-Encoding',
+    }
+    if _matches(request.headers.get('If-None-Match', ''), body):
+        return Response(status=304, headers=headers)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(body.bodies[encoding], mimetype=body.mimetype, headers=headers)
@@ -0,0 +1,227 @@
+"""
+Record and replay the timetable server
+
+Recording: a ScheduleScraper given a Recorder (or the app with
+SCRAPE_RECORD_DIR set) saves every response of its crawl under a
+directory, like test_page.html/schedule_test.html but for the whole tree:
+
+    <dir>/index.json        request key -> status, headers and body file
+    <dir>/bodies/<sha>.html response bodies, stored once per distinct content
+
+Replay: create_app() is a stand-in for the timetable server that answers
+from a recording, with configurable latency, error rate and concurrency
+limit, so scrape_all can be run and timed offline:
+
+    python replay.py record recordings/fshn [--base-url URL]
+    python replay.py serve recordings/fshn [--port 5055] [--latency 80] [--jitter 40]
+                           [--error-rate 0.02] [--concurrency 4 [--reject]]
+    BASE_URL=http://127.0.0.1:5055 python empty_halls_scraper.py
+
+Requests are matched on method, path below the base URL and form fields,
+so the stand-in serves the tree at its root.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import unquote, urlencode, urlsplit
+
+from flask import Flask, Response, jsonify, request
+
+INDEX_FILE = 'index.json'
+BODIES_DIR = 'bodies'
+# Response headers worth replaying; the rest describe the original connection
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def request_key(method, path, form=None):
+    """'POST /student?dega=...&paraleli=...' style key of one upstream request"""
+    key = f"{method.upper()} {path}"
+    if form:
+        key += '?' + urlencode(sorted(form.items()))
+    return key
+
+
+class Recorder:
+    """Saves the responses of a crawl; thread safe, call save() when done"""
+
+    def __init__(self, directory, base_url):
+        self.directory = directory
+        self.base_path = unquote(urlsplit(base_url).path).rstrip('/')
+        self.index = load_index(directory)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, BODIES_DIR), exist_ok=True)
+
+    def record(self, method, url, data, response):
+        # A 304 answered a conditional request; the recorded page is still the current one
+        if response.status_code == 304:
+            return
+        path = unquote(urlsplit(url).path)
+        if path.startswith(self.base_path):
+            path = path[len(self.base_path):]
+        body = response.content
+        name = f"{BODIES_DIR}/{hashlib.sha256(body).hexdigest()[:32]}.html"
+        body_path = os.path.join(self.directory, name)
+        if not os.path.exists(body_path):
+            with open(body_path, 'wb') as f:
+                f.write(body)
+        entry = {
+            'status': response.status_code,
+            'headers': {header: response.headers[header] for header in KEPT_HEADERS if header in response.headers},
+            'body': name,
+        }
+        with self._lock:
+            self.index[request_key(method, path, data)] = entry
+
+    def save(self):
+        with self._lock:
+            index = dict(self.index)
+        tmp_path = os.path.join(self.directory, f"{INDEX_FILE}.tmp{os.getpid()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
+        return len(index)
+
+
+def load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def create_app(directory, latency=0.0, jitter=0.0, error_rate=0.0, concurrency=0, reject=False, seed=None):
+    """Flask app replaying a recording.
+
+    Every request waits `latency` ± `jitter` seconds and fails with a 503 at
+    `error_rate`. With `concurrency` set, only that many requests are served
+    at once: the rest queue, or get a 503 straight away with `reject`.
+    Statistics are served at /_replay/stats.
+    """
+    index = load_index(directory)
+    bodies = {}
+    rng = random.Random(seed)
+    slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+    stats_lock = threading.Lock()
+    stats = {'recorded': len(index), 'requests': 0, 'served': 0, 'not_modified': 0, 'missing': 0,
+             'injected_errors': 0, 'rejected': 0, 'active': 0, 'max_active': 0}
+    app = Flask('replay')
+
+    def count(name, delta=1):
+        with stats_lock:
+            stats[name] += delta
+            stats['max_active'] = max(stats['max_active'], stats['active'])
+
+    def body(name):
+        if name not in bodies:
+            with open(os.path.join(directory, name), 'rb') as f:
+                bodies[name] = f.read()
+        return bodies[name]
+
+    def respond(path):
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if rng.random() < error_rate:
+            count('injected_errors')
+            return Response('Injected error', status=503)
+        entry = index.get(request_key(request.method, path, request.form if request.method == 'POST' else request.args))
+        if entry is None:
+            count('missing')
+            return Response('Not recorded', status=404)
+        etag = entry['headers'].get('ETag')
+        if etag and request.headers.get('If-None-Match') == etag:
+            count('not_modified')
+            return Response(status=304, headers={'ETag': etag})
+        count('served')
+        return Response(body(entry['body']), status=entry['status'], headers=entry['headers'])
+
+    @app.route('/_replay/stats')
+    def replay_stats():
+        with stats_lock:
+            return jsonify(stats)
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
+    @app.route('/<path:path>', methods=['GET', 'POST'])
+    def replay(path):
+        count('requests')
+        if slots is not None and not slots.acquire(blocking=not reject):
+            count('rejected')
+            return Response('Too many concurrent requests', status=503)
+        count('active')
+        try:
+            return respond('/' + path)
+        finally:
+            count('active', -1)
+            if slots is not None:
+                slots.release()
+
+    app.config['REPLAY_STATS'] = stats
+    return app
+
+
+def start_server(app, host='127.0.0.1', port=0):
+    """Serve `app` from a daemon thread; returns (server, base_url)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def record(directory, base_url, concurrency=None):
+    """Crawl `base_url` once with a Recorder attached; returns the scraper"""
+    # Only the crawler: importing the app module doesn't start the app
+    from empty_halls_scraper import ScheduleScraper, start_scrape_log
+    start_scrape_log()
+    recorder = Recorder(directory, base_url)
+    scraper = ScheduleScraper(base_url, recorder=recorder)
+    scraper.scrape_all(concurrency)
+    print(f"Recorded {recorder.save()} responses in {directory} "
+          f"({scraper.stats['requests']} requests, {scraper.stats['failed_pages']} failed pages)")
+    return scraper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='crawl the live server and save every response')
+    record_parser.add_argument('directory')
+    record_parser.add_argument('--base-url', default=None, help='defaults to the app BASE_URL')
+    record_parser.add_argument('--concurrency', type=int, default=None)
+    serve_parser = commands.add_parser('serve', help='run the stand-in server')
+    serve_parser.add_argument('directory')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5055)
+    serve_parser.add_argument('--latency', type=float, default=0, help='milliseconds per request')
+    serve_parser.add_argument('--jitter', type=float, default=0, help='± milliseconds')
+    serve_parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered 503')
+    serve_parser.add_argument('--concurrency', type=int, default=0, help='requests served at once (0 = unlimited)')
+    serve_parser.add_argument('--reject', action='store_true', help='503 instead of queueing over the limit')
+    serve_parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        if args.base_url is None:
+            from empty_halls_scraper import BASE_URL
+            args.base_url = BASE_URL
+        record(args.directory, args.base_url, args.concurrency)
+        return
+    app = create_app(args.directory, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                     error_rate=args.error_rate, concurrency=args.concurrency, reject=args.reject, seed=args.seed)
+    print(f"Replaying {app.config['REPLAY_STATS']['recorded']} responses from {args.directory} "
+          f"on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Optional SQLite store of published schedule snapshots
+
+Every published snapshot is written in one transaction as rows of
+`snapshots`, `halls` and `classes`, keyed by snapshot version, and the
+last `history` versions are kept. The database runs in WAL mode, so
+readers in every worker keep reading while a refresh writes and never see
+half of a snapshot. Free-hall and per-hall questions for a version are
+answered by indexed queries (SQLiteHallIndex), and any stored version can
+be loaded back as a schedule_model.Schedule.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from hall_index import HallIndex, _minutes, merge_spans
+from schedule_model import Schedule
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    version INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    halls INTEGER NOT NULL,
+    classes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS halls (
+    version INTEGER NOT NULL REFERENCES snapshots (version) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (version, name)
+);
+CREATE TABLE IF NOT EXISTS classes (
+    version INTEGER NOT NULL REFERENCES snapshots (version) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    hall TEXT NOT NULL,
+    start_min INTEGER NOT NULL,
+    end_min INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    professor TEXT NOT NULL,
+    groups TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classes_day_hall_start ON classes (version, day, hall, start_min);
+"""
+
+# Halls of a version with no (non-empty) class overlapping [?, ?) on a day
+_FREE_HALLS = """
+SELECT name FROM halls AS h
+WHERE h.version = :version AND NOT EXISTS (
+    SELECT 1 FROM classes AS c
+    WHERE c.version = h.version AND c.day = :day AND c.hall = h.name
+      AND c.start_min < :end AND c.end_min > :start AND c.end_min > c.start_min
+)
+ORDER BY h.position
+"""
+
+_HALL_CLASSES = """
+SELECT start_min, end_min FROM classes
+WHERE version = ? AND day = ? AND hall = ?
+ORDER BY start_min
+"""
+
+
+class ScheduleDB:
+    """Snapshot history in a SQLite database; one connection per thread"""
+
+    def __init__(self, path, history=20):
+        self.path = path
+        self.history = history
+        self._local = threading.local()
+        self._indexes = {}
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE in _transaction)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self.connection())
+
+    def has_version(self, version):
+        row = self.connection().execute('SELECT 1 FROM snapshots WHERE version = ?', (version,)).fetchone()
+        return row is not None
+
+    def write(self, schedule, version, created=None):
+        """Store `schedule` as `version` and prune old versions; False if already stored"""
+        with self._transaction() as conn:
+            if conn.execute('SELECT 1 FROM snapshots WHERE version = ?', (version,)).fetchone():
+                return False
+            conn.execute('INSERT INTO snapshots (version, created, halls, classes) VALUES (?, ?, ?, ?)',
+                         (version, created or time.time(), len(schedule.halls), schedule.entry_count()))
+            conn.executemany('INSERT INTO halls (version, position, name) VALUES (?, ?, ?)',
+                             ((version, position, hall) for position, hall in enumerate(schedule.halls)))
+            conn.executemany(
+                'INSERT INTO classes (version, day, hall, start_min, end_min, subject, professor, groups) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((version, day, hall, cls.start, cls.end, cls.subject, cls.professor,
+                  json.dumps(cls.groups, ensure_ascii=False))
+                 for day, day_halls in schedule.days.items()
+                 for hall, classes in day_halls.items()
+                 for cls in classes))
+            conn.execute('DELETE FROM snapshots WHERE version NOT IN '
+                         '(SELECT version FROM snapshots ORDER BY version DESC LIMIT ?)', (self.history,))
+        return True
+
+    def load(self, version):
+        """The stored schedule of `version`, or None"""
+        conn = self.connection()
+        # One read transaction, so a concurrent prune can't remove rows half way through
+        conn.execute('BEGIN')
+        try:
+            if not conn.execute('SELECT 1 FROM snapshots WHERE version = ?', (version,)).fetchone():
+                return None
+            schedule = Schedule(name for (name,) in conn.execute(
+                'SELECT name FROM halls WHERE version = ? ORDER BY position', (version,)))
+            rows = conn.execute('SELECT day, hall, start_min, end_min, subject, professor, groups '
+                                'FROM classes WHERE version = ? ORDER BY rowid', (version,))
+            for day, hall, start, end, subject, professor, groups in rows:
+                schedule.add(day, hall, start, end, subject, professor, json.loads(groups))
+            return schedule
+        finally:
+            conn.execute('COMMIT')
+
+    def snapshots(self):
+        """Stored versions, newest first"""
+        rows = self.connection().execute(
+            'SELECT version, created, halls, classes FROM snapshots ORDER BY version DESC')
+        return [{'version': version, 'created': created, 'halls': halls, 'classes': classes}
+                for version, created, halls, classes in rows]
+
+    def index(self, version):
+        """SQLiteHallIndex for a stored version, or None"""
+        index = self._indexes.get(version)
+        if index is None:
+            if not self.has_version(version):
+                return None
+            index = SQLiteHallIndex(self, version)
+            # Requests only ask about the version being served; keep the last couple
+            self._indexes = {v: i for v, i in self._indexes.items() if v > version - 2}
+            self._indexes[version] = index
+        return index
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on error"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class SQLiteHallIndex(HallIndex):
+    """The HallIndex queries for one stored version, answered by SQLite.
+
+    Free-hall lookups are one indexed query; per-hall questions (next free,
+    next busy, status) fetch that hall's classes for the day through the
+    (version, day, hall, start_min) index and reuse HallIndex's logic.
+    """
+
+    def __init__(self, db, version):
+        self.db = db
+        self.version = version
+        self.halls = [name for (name,) in db.connection().execute(
+            'SELECT name FROM halls WHERE version = ? ORDER BY position', (version,))]
+        self._positions = {hall: i for i, hall in enumerate(self.halls)}
+
+    def _free(self, day, start, end):
+        rows = self.db.connection().execute(
+            _FREE_HALLS, {'version': self.version, 'day': day, 'start': start, 'end': end})
+        return [name for (name,) in rows]
+
+    def _hall_intervals(self, day, hall):
+        if hall not in self._positions:
+            return [], []
+        return merge_spans(self.db.connection().execute(_HALL_CLASSES, (self.version, day, hall)))
+
+    def free_halls(self, day, time):
+        minute = _minutes(time)
+        return self._free(day, minute, minute + 1)
+
+    def free_between(self, day, start, end):
+        start, end = _minutes(start), _minutes(end)
+        if end <= start:
+            raise ValueError("Window end must be after its start")
+        return self._free(day, start, end)
@@ -0,0 +1,171 @@
+"""
+Compact in-memory schedule model
+
+A faculty schedule used to be `schedule[day][hall] -> [dict, ...]` with
+five strings per class, each its own object. Here a class is a __slots__
+record with integer minute times, every string is interned and every
+distinct list of groups is one shared tuple, so thousands of classes
+share a few hundred string objects. to_json() produces the old dict shape
+for the API and the JSON export; schedule_delta() the per-hall changes
+between two versions.
+"""
+
+import sys
+from collections import Counter
+
+from hall_index import minutes_to_time, time_to_minutes
+
+
+def entry_groups(entry):
+    """Groups of a dict entry, for both coalesced and raw (single `group`) entries"""
+    return entry.get('groups') or [entry['group']]
+
+
+class ClassEntry:
+    """One class in one hall on one day"""
+
+    __slots__ = ('start', 'end', 'subject', 'professor', 'groups')
+
+    def __init__(self, start, end, subject, professor, groups):
+        self.start = start          # minutes since midnight
+        self.end = end
+        self.subject = subject
+        self.professor = professor
+        self.groups = groups        # tuple of group names
+
+    def key(self):
+        return (self.start, self.end, self.subject, self.professor, self.groups)
+
+    def __eq__(self, other):
+        return isinstance(other, ClassEntry) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return (f"ClassEntry({minutes_to_time(self.start)}-{minutes_to_time(self.end)}, "
+                f"{self.subject!r}, groups={self.groups!r})")
+
+    def to_dict(self):
+        return {
+            'start': minutes_to_time(self.start),
+            'end': minutes_to_time(self.end),
+            'subject': self.subject,
+            'professor': self.professor,
+            # The joined string is what consumers of the JSON export and /api/schedule read
+            'group': ', '.join(self.groups),
+            'groups': list(self.groups),
+        }
+
+
+class Schedule:
+    """Classes of one faculty as `days[day][hall] -> [ClassEntry, ...]`, plus the hall list"""
+
+    def __init__(self, halls=()):
+        self.days = {}
+        self.halls = []
+        self._hall_set = set()
+        self._group_sets = {}
+        for hall in halls:
+            self.add_hall(hall)
+
+    def add_hall(self, hall):
+        if hall not in self._hall_set:
+            hall = sys.intern(hall)
+            self._hall_set.add(hall)
+            self.halls.append(hall)
+
+    def group_set(self, groups):
+        """The shared tuple for a list of group names"""
+        groups = tuple(sys.intern(group) for group in groups)
+        return self._group_sets.setdefault(groups, groups)
+
+    def add(self, day, hall, start, end, subject, professor, groups):
+        # Every hall with classes is in `halls`, which the index and analytics are built from
+        self.add_hall(hall)
+        entry = ClassEntry(start, end, sys.intern(subject), sys.intern(professor), self.group_set(groups))
+        self.days.setdefault(sys.intern(day), {}).setdefault(sys.intern(hall), []).append(entry)
+        return entry
+
+    def add_dict(self, day, hall, cls):
+        """Add an entry in the scraper/JSON dict shape ('HH:MM' times)"""
+        return self.add(day, hall, time_to_minutes(cls['start']), time_to_minutes(cls['end']),
+                        cls['subject'], cls['professor'], entry_groups(cls))
+
+    def classes(self, day, hall):
+        return self.days.get(day, {}).get(hall, [])
+
+    def entry_count(self):
+        return sum(len(classes) for day_halls in self.days.values() for classes in day_halls.values())
+
+    def memory_bytes(self):
+        """Approximate deep size of the model, counting each shared string and tuple once"""
+        seen = set()
+        total = sum(map(sys.getsizeof, (self.days, self.halls, self._hall_set, self._group_sets)))
+
+        def shared(obj):
+            nonlocal total
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+        for hall in self.halls:
+            shared(hall)
+        for day, day_halls in self.days.items():
+            shared(day)
+            total += sys.getsizeof(day_halls)
+            for hall, classes in day_halls.items():
+                shared(hall)
+                total += sys.getsizeof(classes)
+                for entry in classes:
+                    total += sys.getsizeof(entry) + sys.getsizeof(entry.start) + sys.getsizeof(entry.end)
+                    shared(entry.subject)
+                    shared(entry.professor)
+                    shared(entry.groups)
+                    for group in entry.groups:
+                        shared(group)
+        return total
+
+    def __eq__(self, other):
+        return isinstance(other, Schedule) and self.days == other.days and self.halls == other.halls
+
+    def to_json(self):
+        """The `{day: {hall: [dict, ...]}}` shape served by /api/schedule"""
+        return {
+            day: {hall: [entry.to_dict() for entry in classes] for hall, classes in day_halls.items()}
+            for day, day_halls in self.days.items()
+        }
+
+    @classmethod
+    def from_json(cls, schedule, halls):
+        model = cls(halls)
+        for day, day_halls in schedule.items():
+            for hall, classes in day_halls.items():
+                for entry in classes:
+                    model.add_dict(day, hall, entry)
+        return model
+
+
+def schedule_delta(old, new):
+    """Changes from `old` to `new` as `{day: {hall: {'added': [dict], 'removed': [dict]}}}`.
+
+    Only halls whose classes differ are listed, and each list only holds
+    the classes that differ (compared as multisets, in dict form).
+    Applying the removals and additions to `old` and sorting every hall by
+    (start, end, subject) gives `new`.
+    """
+    changes = {}
+    for day in list(new.days) + [day for day in old.days if day not in new.days]:
+        old_halls, new_halls = old.days.get(day, {}), new.days.get(day, {})
+        for hall in list(new_halls) + [hall for hall in old_halls if hall not in new_halls]:
+            before, after = old_halls.get(hall, []), new_halls.get(hall, [])
+            if before == after:
+                continue
+            added = Counter(after) - Counter(before)
+            removed = Counter(before) - Counter(after)
+            if not added and not removed:
+                continue
+            changes.setdefault(day, {})[hall] = {
+                'added': [entry.to_dict() for entry in added.elements()],
+                'removed': [entry.to_dict() for entry in removed.elements()],
+            }
+    return changes
@@ -0,0 +1,209 @@
+"""
+Compact binary snapshot of the faculty schedule
+
+Layout (little endian, format version 3):
+
+    header      magic 'SLBS', u16 format version, u16 day count, u32 string count,
+                u32 hall count, u32 group set count, u64 snapshot version
+    strings     (string count + 1) u32 offsets into the UTF-8 string blob, then the blob
+    halls       u32 string id per hall, in faculty_halls order
+    group sets  per set: u32 group count, then a u32 string id per group
+    days        per day: u32 name id, u32 block offset, u32 hall count
+    day block   per hall: u32 hall id, u32 entry count; then the day's entries as
+                u16 start minute, u16 end minute, u32 subject id, u32 professor id, u32 group set id
+
+Every hall, subject, professor and group string is stored once in the
+intern table, and every distinct list of groups once in the group set
+table. The reader maps the file and decodes a day only when it is asked
+for, into schedule_model records that share one (interned) object per
+distinct value.
+"""
+
+import mmap
+import os
+import struct
+import sys
+
+from schedule_model import ClassEntry, Schedule
+
+MAGIC = b'SLBS'
+FORMAT_VERSION = 3
+
+_HEADER = struct.Struct('<4sHHIIIQ')
+_DAY = struct.Struct('<III')
+_HALL = struct.Struct('<II')
+_ENTRY = struct.Struct('<HHIII')
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return sid
+
+
+def encode_snapshot(schedule, version=0):
+    """Serialize a schedule_model.Schedule to bytes.
+
+    `version` is the monotonic snapshot version, readable from the header alone.
+    """
+    strings = _StringTable()
+    group_sets = _StringTable()
+    hall_ids = [strings.intern(hall) for hall in schedule.halls]
+    days = []
+    for day, day_halls in schedule.days.items():
+        hall_records = []
+        entries = []
+        for hall, classes in day_halls.items():
+            hall_records.append(_HALL.pack(strings.intern(hall), len(classes)))
+            for cls in classes:
+                entries.append(_ENTRY.pack(
+                    cls.start,
+                    cls.end,
+                    strings.intern(cls.subject),
+                    strings.intern(cls.professor),
+                    group_sets.intern(tuple(strings.intern(group) for group in cls.groups)),
+                ))
+        days.append((strings.intern(day), b''.join(hall_records) + b''.join(entries), len(hall_records)))
+
+    encoded = [value.encode('utf-8') for value in strings.values]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    parts = [
+        _HEADER.pack(MAGIC, FORMAT_VERSION, len(days), len(encoded), len(hall_ids), len(group_sets.values), version),
+        struct.pack(f'<{len(offsets)}I', *offsets),
+        b''.join(encoded),
+        struct.pack(f'<{len(hall_ids)}I', *hall_ids),
+    ]
+    for group_ids in group_sets.values:
+        parts.append(struct.pack(f'<I{len(group_ids)}I', len(group_ids), *group_ids))
+    block_offset = sum(len(part) for part in parts) + _DAY.size * len(days)
+    for name_id, block, hall_count in days:
+        parts.append(_DAY.pack(name_id, block_offset, hall_count))
+        block_offset += len(block)
+    parts.extend(block for _, block, _ in days)
+    return b''.join(parts)
+
+
+def write_snapshot(path, schedule, version=0):
+    """Atomically write a snapshot file (readers never see a partial file)"""
+    data = encode_snapshot(schedule, version)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class SnapshotReader:
+    """Memory-mapped snapshot with per-day lazy decoding.
+
+    Raises ValueError if the file is not a snapshot of a supported version.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Empty snapshot file: {path}")
+        buf = self._buf
+        if len(buf) < _HEADER.size:
+            raise ValueError(f"Truncated snapshot file: {path}")
+        magic, format_version, day_count, string_count, hall_count, set_count, version = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        self.version = version
+        pos = _HEADER.size
+        self._offsets = struct.unpack_from(f'<{string_count + 1}I', buf, pos)
+        pos += 4 * (string_count + 1)
+        self._blob_start = pos
+        pos += self._offsets[-1]
+        self._strings = [None] * string_count
+        hall_ids = struct.unpack_from(f'<{hall_count}I', buf, pos)
+        pos += 4 * hall_count
+        self.halls = [self.string(sid) for sid in hall_ids]
+        # One shared tuple of group names per group set
+        self._group_sets = []
+        for _ in range(set_count):
+            (count,) = struct.unpack_from('<I', buf, pos)
+            self._group_sets.append(tuple(self.string(sid) for sid in struct.unpack_from(f'<{count}I', buf, pos + 4)))
+            pos += 4 * (count + 1)
+        self._day_blocks = {}
+        for name_id, block_offset, day_halls in _DAY.iter_unpack(buf[pos:pos + _DAY.size * day_count]):
+            self._day_blocks[self.string(name_id)] = (block_offset, day_halls)
+        self._days = {}
+
+    @property
+    def days(self):
+        return list(self._day_blocks)
+
+    def string(self, sid):
+        value = self._strings[sid]
+        if value is None:
+            start = self._blob_start + self._offsets[sid]
+            end = self._blob_start + self._offsets[sid + 1]
+            value = self._strings[sid] = sys.intern(self._buf[start:end].decode('utf-8'))
+        return value
+
+    def day(self, name):
+        """Decoded `{hall: [ClassEntry, ...]}` for one day (cached after first use)"""
+        if name in self._days:
+            return self._days[name]
+        block_offset, hall_count = self._day_blocks[name]
+        hall_end = block_offset + _HALL.size * hall_count
+        hall_records = list(_HALL.iter_unpack(self._buf[block_offset:hall_end]))
+        entry_count = sum(count for _, count in hall_records)
+        raw_entries = _ENTRY.iter_unpack(self._buf[hall_end:hall_end + _ENTRY.size * entry_count])
+        string, group_sets = self.string, self._group_sets
+        day_halls = {}
+        for hall_id, count in hall_records:
+            day_halls[string(hall_id)] = [
+                ClassEntry(start, end, string(subject), string(professor), group_sets[group_set])
+                for start, end, subject, professor, group_set in (next(raw_entries) for _ in range(count))
+            ]
+        self._days[name] = day_halls
+        return day_halls
+
+    def to_schedule(self):
+        """Decode every day into a schedule_model.Schedule"""
+        schedule = Schedule(self.halls)
+        schedule.days = {name: self.day(name) for name in self._day_blocks}
+        # Files written before Schedule.add registered halls may lack some in the hall list
+        for day_halls in schedule.days.values():
+            for hall in day_halls:
+                schedule.add_hall(hall)
+        return schedule
+
+    def close(self):
+        self._buf.close()
+
+
+def read_snapshot(path):
+    """Load a snapshot file fully; returns (schedule, version)"""
+    reader = SnapshotReader(path)
+    try:
+        return reader.to_schedule(), reader.version
+    finally:
+        reader.close()
+
+
+def read_snapshot_version(path):
+    """Snapshot version from the header only (0 if missing or unreadable)"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return 0
+    if len(header) < _HEADER.size:
+        return 0
+    magic, format_version, _, _, _, _, version = _HEADER.unpack(header)
+    return version if magic == MAGIC and format_version == FORMAT_VERSION else 0
@@ -0,0 +1,52 @@
+"""Tests for the app module's refresh logic; importing it starts nothing (see create_app)"""
+
+from types import SimpleNamespace
+
+from empty_halls_scraper import SCRAPE_MAX_FAILED_RATIO, SNAPSHOT_MIN_RATIO, ScheduleSnapshot, completeness_problem
+from schedule_model import Schedule
+
+DAY = 'E Hënë'
+
+
+def schedule_of(halls, classes_per_hall):
+    schedule = Schedule()
+    for h in range(halls):
+        for c in range(classes_per_hall):
+            schedule.add(DAY, f'Salla ({h})', 8 * 60 + c * 60, 9 * 60 + c * 60, f'Subject {c}', 'Prof', ['I - A'])
+    return schedule
+
+
+def crawl(schedule, pages=100, failed_pages=0):
+    return SimpleNamespace(schedule_data=schedule, stats={'pages': pages, 'failed_pages': failed_pages})
+
+
+def test_complete_crawl_replaces_the_snapshot():
+    current = ScheduleSnapshot(schedule_of(10, 4), version=3)
+    assert completeness_problem(crawl(schedule_of(10, 4)), current) is None
+    # Shrinking within the tolerated ratios is fine too
+    assert completeness_problem(crawl(schedule_of(9, 4), failed_pages=int(100 * SCRAPE_MAX_FAILED_RATIO)), current) is None
+
+
+def test_too_many_failed_pages():
+    current = ScheduleSnapshot(schedule_of(10, 4), version=3)
+    failed = int(100 * SCRAPE_MAX_FAILED_RATIO) + 1
+    assert completeness_problem(crawl(schedule_of(10, 4), failed_pages=failed), current) == \
+        f"{failed} of 100 timetable pages failed"
+
+
+def test_too_few_classes():
+    current = ScheduleSnapshot(schedule_of(10, 10), version=3)
+    classes = int(100 * SNAPSHOT_MIN_RATIO) - 10
+    problem = completeness_problem(crawl(schedule_of(10, classes // 10)), current)
+    assert problem == f"only {classes} classes, version 3 has 100"
+
+
+def test_too_few_halls():
+    current = ScheduleSnapshot(schedule_of(10, 1), version=3)
+    # As many classes as before, in fewer halls
+    problem = completeness_problem(crawl(schedule_of(5, 2)), current)
+    assert problem == "only 5 halls, version 3 has 10"
+
+
+def test_anything_replaces_an_empty_snapshot():
+    assert completeness_problem(crawl(schedule_of(1, 1), pages=1), ScheduleSnapshot(Schedule())) is None
@@ -0,0 +1,68 @@
+"""Tests for the ingest stage (ingest.coalesce_schedule)"""
+
+from ingest import coalesce_schedule
+from schedule_model import Schedule
+
+DAY = 'E Hënë'
+HALL = 'Salla (101)'
+
+
+def runs(schedule, hall=HALL):
+    return [(cls.start, cls.end, cls.subject, cls.groups) for cls in schedule.classes(DAY, hall)]
+
+
+def test_back_to_back_slots_become_one_interval():
+    raw = Schedule()
+    raw.add(DAY, HALL, 8 * 60, 9 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 9 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 9 * 60 + 30, 11 * 60, 'Algebra', 'Prof A', ['I - A'])
+    coalesced, report = coalesce_schedule(raw)
+    assert runs(coalesced) == [(8 * 60, 11 * 60, 'Algebra', ('I - A',))]
+    assert (report['entries_before'], report['entries_after']) == (3, 1)
+
+
+def test_gaps_and_other_classes_stay_apart():
+    raw = Schedule()
+    raw.add(DAY, HALL, 8 * 60, 9 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 10 * 60, 11 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 9 * 60, 10 * 60, 'Physics', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 11 * 60, 12 * 60, 'Algebra', 'Prof B', ['I - A'])
+    coalesced, _ = coalesce_schedule(raw)
+    assert [(start, end, subject) for start, end, subject, _ in runs(coalesced)] == [
+        (8 * 60, 9 * 60, 'Algebra'),
+        (9 * 60, 10 * 60, 'Physics'),
+        (10 * 60, 11 * 60, 'Algebra'),
+        (11 * 60, 12 * 60, 'Algebra'),
+    ]
+
+
+def test_groups_of_a_shared_slot_are_merged_once():
+    raw = Schedule()
+    # The same lecture as seen on the pages of three groups, one of them crawled twice
+    for group in ['I - B', 'I - A', 'I - B', 'I - C']:
+        raw.add(DAY, HALL, 8 * 60, 9 * 60, 'Algebra', 'Prof A', [group])
+    coalesced, _ = coalesce_schedule(raw)
+    assert runs(coalesced) == [(8 * 60, 9 * 60, 'Algebra', ('I - A', 'I - B', 'I - C'))]
+
+
+def test_slots_merge_only_with_the_same_groups():
+    raw = Schedule()
+    raw.add(DAY, HALL, 8 * 60, 9 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 9 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - A'])
+    raw.add(DAY, HALL, 9 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - B'])
+    coalesced, _ = coalesce_schedule(raw)
+    assert runs(coalesced) == [(8 * 60, 9 * 60, 'Algebra', ('I - A',)),
+                               (9 * 60, 10 * 60, 'Algebra', ('I - A', 'I - B'))]
+
+
+def test_coalescing_twice_changes_nothing():
+    raw = Schedule(['Salla (102)'])
+    for group in ['I - A', 'I - B']:
+        for hour in (8, 9, 10):
+            raw.add(DAY, HALL, hour * 60, (hour + 1) * 60, 'Algebra', 'Prof A', [group])
+    once, _ = coalesce_schedule(raw)
+    twice, report = coalesce_schedule(once)
+    assert twice == once
+    assert report['entries_before'] == report['entries_after'] == 1
+    # Halls without classes are kept
+    assert once.halls == ['Salla (102)', HALL]
@@ -0,0 +1,89 @@
+"""Tests for schedule_model: the model's dict shape and schedule_delta"""
+
+import json
+from collections import Counter
+
+from schedule_model import Schedule, schedule_delta
+
+
+def canonical(cls):
+    return json.dumps(cls, sort_keys=True)
+
+
+def apply_delta(schedule_json, changes):
+    """What the page does with a delta: apply it to its copy of the old schedule"""
+    result = {day: {hall: list(classes) for hall, classes in halls.items()} for day, halls in schedule_json.items()}
+    for day, halls in changes.items():
+        for hall, change in halls.items():
+            classes = Counter(map(canonical, result.get(day, {}).get(hall, [])))
+            classes.subtract(map(canonical, change['removed']))
+            classes.update(map(canonical, change['added']))
+            result.setdefault(day, {})[hall] = [json.loads(cls) for cls in classes.elements()]
+    return normalized(result)
+
+
+def normalized(schedule_json):
+    """Every hall sorted by (start, end, subject), halls and days without classes dropped"""
+    result = {}
+    for day, halls in schedule_json.items():
+        for hall, classes in halls.items():
+            if classes:
+                result.setdefault(day, {})[hall] = sorted(
+                    classes, key=lambda cls: (cls['start'], cls['end'], cls['subject'], cls['groups']))
+    return result
+
+
+def old_schedule():
+    schedule = Schedule(['Salla (101)', 'Salla (102)'])
+    schedule.add('E Hënë', 'Salla (101)', 8 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - A'])
+    schedule.add('E Hënë', 'Salla (101)', 10 * 60, 12 * 60, 'Physics', 'Prof B', ['I - A', 'I - B'])
+    schedule.add('E Hënë', 'Salla (102)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    schedule.add('E Martë', 'Salla (102)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    return schedule
+
+
+def test_class_dicts_keep_the_joined_group():
+    cls = old_schedule().classes('E Hënë', 'Salla (101)')[1]
+    assert cls.to_dict() == {'start': '10:00', 'end': '12:00', 'subject': 'Physics', 'professor': 'Prof B',
+                             'group': 'I - A, I - B', 'groups': ['I - A', 'I - B']}
+
+
+def test_same_schedule_has_no_changes():
+    assert schedule_delta(old_schedule(), old_schedule()) == {}
+
+
+def test_delta_lists_only_changed_halls_and_classes():
+    old = old_schedule()
+    new = Schedule(old.halls)
+    new.add('E Hënë', 'Salla (101)', 8 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - A'])
+    new.add('E Hënë', 'Salla (101)', 10 * 60, 12 * 60, 'Physics', 'Prof B', ['I - A'])
+    new.add('E Hënë', 'Salla (102)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    new.add('E Martë', 'Salla (102)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    changes = schedule_delta(old, new)
+    assert list(changes) == ['E Hënë']
+    assert list(changes['E Hënë']) == ['Salla (101)']
+    change = changes['E Hënë']['Salla (101)']
+    assert [cls['groups'] for cls in change['removed']] == [['I - A', 'I - B']]
+    assert [cls['groups'] for cls in change['added']] == [['I - A']]
+
+
+def test_applying_the_delta_gives_the_new_schedule():
+    old = old_schedule()
+    new = Schedule(old.halls + ['Salla (103)'])
+    # Reordered, one class moved, a hall emptied, a day dropped and a new day and hall
+    new.add('E Hënë', 'Salla (101)', 10 * 60, 12 * 60, 'Physics', 'Prof B', ['I - A', 'I - B'])
+    new.add('E Hënë', 'Salla (101)', 8 * 60, 10 * 60, 'Algebra', 'Prof A', ['I - A'])
+    new.add('E Hënë', 'Salla (103)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    new.add('E Premte', 'Salla (103)', 14 * 60, 16 * 60, 'Lab', 'Prof D', ['III - A'])
+    changes = schedule_delta(old, new)
+    assert apply_delta(old.to_json(), changes) == normalized(new.to_json())
+
+
+def test_duplicate_classes_count_as_a_multiset():
+    old = old_schedule()
+    new = old_schedule()
+    new.add('E Hënë', 'Salla (102)', 8 * 60, 9 * 60, 'Chemistry', 'Prof C', ['II - A'])
+    changes = schedule_delta(old, new)
+    assert changes == {'E Hënë': {'Salla (102)': {
+        'added': [new.classes('E Hënë', 'Salla (102)')[0].to_dict()], 'removed': []}}}
+    assert apply_delta(old.to_json(), changes) == normalized(new.to_json())
@@ -0,0 +1,72 @@
+"""Tests for the binary schedule snapshot (snapshot.py)"""
+
+import pytest
+
+from schedule_model import Schedule
+from snapshot import MAGIC, SnapshotReader, encode_snapshot, read_snapshot, read_snapshot_version, write_snapshot
+
+
+def sample_schedule():
+    schedule = Schedule(['Salla (101)', 'Klasa (5)', 'Salla (305C)'])
+    schedule.add('E Hënë', 'Salla (101)', 8 * 60, 10 * 60, 'Algjebër', 'Prof. Çela', ['I - A', 'I - B'])
+    schedule.add('E Hënë', 'Salla (101)', 10 * 60, 11 * 60 + 30, 'Fizikë', 'Prof. Ëmeri', ['I - A'])
+    schedule.add('E Hënë', 'Klasa (5)', 8 * 60, 9 * 60, 'Algjebër', 'Prof. Çela', ['I - A', 'I - B'])
+    schedule.add('E Premte', 'Salla (305C)', 23 * 60, 23 * 60 + 59, 'Seminar', 'Unknown', ['II - C'])
+    return schedule
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'schedule.bin'
+    schedule = sample_schedule()
+    size = write_snapshot(path, schedule, version=42)
+    assert size == path.stat().st_size == len(encode_snapshot(schedule, 42))
+    loaded, version = read_snapshot(path)
+    assert version == 42
+    assert loaded == schedule
+    assert loaded.to_json() == schedule.to_json()
+
+
+def test_strings_and_group_sets_are_shared(tmp_path):
+    path = tmp_path / 'schedule.bin'
+    write_snapshot(path, sample_schedule())
+    loaded, _ = read_snapshot(path)
+    first, second = loaded.classes('E Hënë', 'Salla (101)')[0], loaded.classes('E Hënë', 'Klasa (5)')[0]
+    assert first.groups is second.groups
+    assert first.subject is second.subject
+
+
+def test_days_are_decoded_on_demand(tmp_path):
+    path = tmp_path / 'schedule.bin'
+    write_snapshot(path, sample_schedule(), version=3)
+    reader = SnapshotReader(path)
+    try:
+        assert reader.version == 3
+        assert reader.days == ['E Hënë', 'E Premte']
+        assert not reader._days
+        assert [cls.subject for cls in reader.day('E Premte')['Salla (305C)']] == ['Seminar']
+        assert list(reader._days) == ['E Premte']
+    finally:
+        reader.close()
+
+
+def test_empty_schedule(tmp_path):
+    path = tmp_path / 'schedule.bin'
+    write_snapshot(path, Schedule())
+    loaded, version = read_snapshot(path)
+    assert (loaded.days, loaded.halls, version) == ({}, [], 0)
+
+
+def test_version_is_read_from_the_header(tmp_path):
+    path = tmp_path / 'schedule.bin'
+    assert read_snapshot_version(path) == 0
+    write_snapshot(path, sample_schedule(), version=7)
+    assert read_snapshot_version(path) == 7
+
+
+@pytest.mark.parametrize('data', [b'', MAGIC, b'JSON' + bytes(40)])
+def test_unreadable_files_raise_value_error(tmp_path, data):
+    path = tmp_path / 'schedule.bin'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+    assert read_snapshot_version(path) == 0
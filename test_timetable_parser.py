@@ -0,0 +1,66 @@
+"""Tests for timetable_parser: the 'stream' backend must match the 'bs4' reference"""
+
+import os
+
+import pytest
+
+from timetable_parser import parse_page, parse_timetable
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PAGES = ['schedule_test.html', 'test_page.html']
+
+TABLE = '<table class="contentTextFormat">{}</table>'
+HEADERS = '<tr><th>Ora</th><td>E Hënë</td></tr><tr><th></th></tr>'
+
+# Markup the tokenizer has to treat like BeautifulSoup's tree builder
+EDGE_CASES = {
+    'plain': HEADERS + '<tr><th>08:00-09:00</th><td class="bodyTd">Algebra\nProf A\nSalla (101)</td></tr>',
+    'br': HEADERS + '<tr><th>08:00-09:00</th><td class="bodyTd">Algebra<br>Prof A<br/>Salla (101)</td></tr>',
+    'no time range': HEADERS + '<tr><th>Pushim</th><td class="bodyTd">Salla (101)</td></tr>',
+    'other cells': HEADERS + '<tr><th>08:00-09:00</th><td>ignored</td><td class="x bodyTd">A\nB\nKlasa 5</td></tr>',
+    'unclosed cells': HEADERS + '<tr><th>08:00-09:00<td class="bodyTd">Algebra\nProf A\nSalla (101)</tr>',
+    'nested rows': HEADERS + '<tr><th>09:00-10:00</th><td class="bodyTd"><table><tr><td class="bodyTd">'
+                             'Lab\nProf B\nSalla (2)</td></tr></table></td></tr>',
+    'script in cell': HEADERS + '<tr><th>08:00-09:00</th><td class="bodyTd"><script>var s = "Salla (9)";'
+                                '</script>Algebra\nProf A\nSalla (101)</td></tr>',
+    'entities': HEADERS + '<tr><th>08:00 - 09:00</th><td class="bodyTd">Fizik&euml;\n&nbsp;Prof&amp;A\n'
+                          'Salla (1&#48;1)</td></tr>',
+    'stray end tags': HEADERS + '</td></span><tr><th>08:00-09:00</th><td class="bodyTd">A\nB\nSalla (7)</td></tr>',
+    'empty cells': HEADERS + '<tr><th>08:00-09:00</th><td class="bodyTd">&nbsp;</td><td class="bodyTd"> </td></tr>',
+}
+
+
+def both(html):
+    return parse_timetable(html, 'I', 'A', 'stream'), parse_timetable(html, 'I', 'A', 'bs4')
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_checked_in_pages(name):
+    with open(os.path.join(ROOT, name), 'rb') as f:
+        raw = f.read()
+    stream, bs4 = both(raw)
+    assert stream == bs4
+    assert both(raw.decode('utf-8')) == (stream, bs4)
+
+
+@pytest.mark.parametrize('name', sorted(EDGE_CASES))
+def test_edge_cases(name):
+    stream, bs4 = both(TABLE.format(EDGE_CASES[name]))
+    assert stream == bs4
+
+
+def test_records():
+    html = TABLE.format(EDGE_CASES['plain'] + '<tr><th>Pushim</th><td class="bodyTd">Salla (102)</td></tr>')
+    records, seconds = parse_page(html, 'I', 'A')
+    assert records == [('E Hënë', 'Salla (101)', 8 * 60, 9 * 60, 'Algebra', 'Prof A', 'I - A'), (None, 'Salla (102)')]
+    assert seconds >= 0
+
+
+def test_page_without_timetable():
+    assert both('<html><body><table><tr><td>nothing</td></tr></table></body></html>') == (None, None)
+    assert parse_page('<p>maintenance</p>', 'I', 'A')[0] is None
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parse_timetable(TABLE.format(''), 'I', 'A', 'lxml')
@@ -0,0 +1,220 @@
+"""
+Timetable page parser
+
+Extracts the class cells of the `table.contentTextFormat` timetable into
+`[day, hall, entry]` records. Two backends produce identical results:
+
+    'stream'  stdlib HTMLParser tokenizer that only follows the timetable
+              table and never builds a tree (default, fastest)
+    'bs4'     full BeautifulSoup tree, the original implementation (reference)
+
+Both reproduce the original BeautifulSoup traversal exactly: every `tr`
+inside the table (nested ones included) is a row, the first two rows are
+headers, a row's time slot is the text of its first `th`, and its cells
+are all `td.bodyTd` elements inside it.
+
+parse_page() is the unit of work of the crawl's parse stage: the same
+records as compact tuples, cheap to send back from a parser process.
+"""
+
+from html.parser import HTMLParser
+import re
+import time
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+from hall_index import time_to_minutes
+
+DAYS = ['E Hënë', 'E Martë', 'E Mërkurë', 'E Enjte', 'E Premte']
+BACKENDS = ('stream', 'bs4')
+
+HALL_RE = re.compile(r'(Salla|Klasa)\s*\(?([\w\d\-]+)\)?', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+))
+_HIDDEN_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+
+def _has_class(attrs, name):
+    for key, value in attrs:
+        if key == 'class' and value and name in value.split():
+            return True
+    return False
+
+
+class _TableTokenizer(HTMLParser):
+    """Collects (first th text, [td.bodyTd texts]) for every tr of the timetable.
+
+    Mirrors the html.parser tree builder: no implicit closing, an end tag
+    closes everything up to the nearest open tag of that name, and unmatched
+    end tags are ignored. Script/style text does not count as cell text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found_table = False
+        self.done = False
+        self.rows = []
+        self._stack = []        # (tag, text collector or None) for every open element
+        self._table_depth = None
+        self._collectors = []   # text buffers of the open th/td.bodyTd elements
+        self._open_rows = []    # rows whose tr is still open
+        self._hidden_text = 0   # open script/style/template elements inside the table
+
+    def handle_starttag(self, tag, attrs):
+        if self.done or tag in _VOID_TAGS:
+            return
+        collector = None
+        if not self.found_table:
+            if tag == 'table' and _has_class(attrs, 'contentTextFormat'):
+                self.found_table = True
+                self._table_depth = len(self._stack)
+        elif tag == 'tr':
+            row = [None, []]
+            self.rows.append(row)
+            self._open_rows.append(row)
+        elif tag == 'th':
+            collector = []
+            for row in self._open_rows:
+                if row[0] is None:
+                    row[0] = collector
+        elif tag == 'td' and _has_class(attrs, 'bodyTd'):
+            collector = []
+            for row in self._open_rows:
+                row[1].append(collector)
+        elif tag in _HIDDEN_TEXT_TAGS:
+            self._hidden_text += 1
+        if collector is not None:
+            self._collectors.append(collector)
+        self._stack.append((tag, collector))
+
+    def handle_startendtag(self, tag, attrs):
+        # <tr/> and friends still open an element in the tree builder
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done or not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, collector = self._stack.pop()
+            if self.found_table:
+                if collector is not None:
+                    self._collectors.remove(collector)
+                elif open_tag == 'tr':
+                    self._open_rows.pop()
+                elif open_tag in _HIDDEN_TEXT_TAGS:
+                    self._hidden_text -= 1
+                if len(self._stack) == self._table_depth:
+                    self.done = True
+                    return
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self._hidden_text:
+            for collector in self._collectors:
+                collector.append(data)
+
+
+def _stream_rows(html):
+    if isinstance(html, bytes):
+        # Same encoding detection BeautifulSoup applies to raw response bytes
+        html = UnicodeDammit(html, is_html=True).unicode_markup
+    tokenizer = _TableTokenizer()
+    tokenizer.feed(html)
+    tokenizer.close()
+    if not tokenizer.found_table:
+        return None
+    return [
+        (''.join(th) if th is not None else None, [''.join(cell) for cell in cells])
+        for th, cells in tokenizer.rows
+    ]
+
+
+def _bs4_rows(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'class': 'contentTextFormat'})
+    if not table:
+        return None
+    rows = []
+    for row in table.find_all('tr'):
+        th = row.find('th')
+        rows.append((th.text if th else None, [cell.text for cell in row.find_all('td', {'class': 'bodyTd'})]))
+    return rows
+
+
+def extract_hall(lines):
+    """Hall name ('Salla (105C)') from the last cell line that mentions one"""
+    for line in reversed(lines):
+        match = HALL_RE.search(line)
+        if match:
+            # Clean up hall name (remove extra spaces, normalize)
+            return WHITESPACE_RE.sub(' ', match.group(0).strip())
+    return None
+
+
+def parse_timetable(html, year, group, backend='stream'):
+    """Parse a timetable page into `[day, hall, entry]` records.
+
+    Returns None when the page has no timetable table. Records for time
+    slots without a '-' are `[None, hall, None]` (the hall is still known).
+    """
+    if backend == 'stream':
+        rows = _stream_rows(html)
+    elif backend == 'bs4':
+        rows = _bs4_rows(html)
+    else:
+        raise ValueError(f"Unknown parser backend: {backend!r}")
+    if rows is None:
+        return None
+
+    group_name = f"{year} - {group}"
+    found = []
+    # Skip first 2 rows (headers)
+    for th_text, cells in rows[2:]:
+        if th_text is None:
+            continue
+        time_slot = th_text.strip()
+        for day_idx, cell in enumerate(cells[:len(DAYS)]):
+            cell_text = cell.strip()
+            # Skip empty cells
+            if not cell_text or cell_text == '&nbsp':
+                continue
+            lines = [line.strip() for line in cell_text.split('\n') if line.strip()]
+            hall = extract_hall(lines)
+            if not hall:
+                continue
+            if '-' in time_slot:
+                start_time, end_time = time_slot.split('-')
+                found.append([DAYS[day_idx], hall, {
+                    'start': start_time.strip(),
+                    'end': end_time.strip(),
+                    'subject': lines[0] if lines else "Unknown",
+                    'professor': lines[1] if len(lines) > 1 else "Unknown",
+                    'group': group_name
+                }])
+            else:
+                found.append([None, hall, None])
+    return found
+
+
+def parse_page(html, year, group, backend='stream'):
+    """parse_timetable() as compact records, plus the seconds spent parsing.
+
+    A class is `(day, hall, start, end, subject, professor, group)` with
+    start/end in minutes since midnight; a hall seen without a class is
+    `(None, hall)`. The records are None when the page has no timetable.
+    """
+    started = time.perf_counter()
+    found = parse_timetable(html, year, group, backend)
+    records = None
+    if found is not None:
+        records = [(None, hall) if entry is None else
+                   (day, hall, time_to_minutes(entry['start']), time_to_minutes(entry['end']),
+                    entry['subject'], entry['professor'], entry['group'])
+                   for day, hall, entry in found]
+    return records, time.perf_counter() - started
@@ -0,0 +1,139 @@
+"""
+Coordination between the worker processes of one deployment
+
+Gunicorn runs several copies of the app that share nothing but the
+filesystem, so the coordination happens there: an flock-based lock elects
+the single process that crawls, snapshot files are compared by stat
+signature to notice a newer snapshot cheaply, and every worker drops a
+small state file so any of them can report on all of them. Refresh jobs
+publish their progress the same way, so any worker can answer for them.
+"""
+
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """Non-blocking, exclusive inter-process lock on a file (fcntl.flock).
+
+    Once acquired it is held until release() or process exit, so a crashed
+    holder never leaves a stale lock behind. Without fcntl (Windows) every
+    process gets the lock, which is the single-process behaviour.
+    Acquire it after gunicorn forks: a lock taken before fork is shared by
+    all children.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+def file_signature(path):
+    """(inode, size, mtime_ns) of a file, or None if it does not exist.
+
+    Snapshot files are replaced atomically, so any rewrite changes this.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_state(path, state):
+    """Atomically write `state` as JSON, stamped with this process's pid and the time"""
+    state = dict(state, pid=os.getpid(), updated=round(time.time(), 3))
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def read_state(path):
+    """A state written by write_state, with 'alive' telling whether its process still runs; None if missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    pid = state.get('pid')
+    state['alive'] = isinstance(pid, int) and pid > 0 and _pid_alive(pid)
+    return state
+
+
+def write_worker_state(directory, state):
+    """Record this process's state as <directory>/<pid>.json"""
+    os.makedirs(directory, exist_ok=True)
+    write_state(os.path.join(directory, f"{os.getpid()}.json"), state)
+
+
+def read_worker_states(directory):
+    """States of all live workers, removing files left by dead ones"""
+    states = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return states
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        pid = state.get('pid')
+        if isinstance(pid, int) and pid > 0 and _pid_alive(pid):
+            states.append(state)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return sorted(states, key=lambda state: state['pid'])